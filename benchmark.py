@@ -0,0 +1,648 @@
+import os
+import sys
+import time
+import queue
+import random
+from collections import defaultdict
+from types import SimpleNamespace
+from maze_core import generate_maze, find_path, key_route, MazeGrid, PathOracle, FlowField, SightLines, FINISH, KEY, \
+    MAX_EXACT_KEYS
+
+# headless micro benchmarks, run as: python benchmark.py [name ...]
+SIZES = ((67, 35), (501, 251))
+
+
+# path_finder as it was before find_path, kept here as the baseline
+def legacy_path_finder(maze_object, start_pos: tuple, end: tuple, wall_block: str = "w"):
+    maze = maze_object.maze
+    q = queue.Queue()
+    q.put((start_pos, [start_pos]))
+    visited = set()
+
+    while not q.empty():
+        current_pos, path = q.get()
+        col, row = current_pos
+
+        if (col, row) == end:
+            return path
+
+        neighbours = legacy_find_neighbours(maze, row, col)
+        for neighbour in neighbours:
+            if neighbour in visited:
+                continue
+            r, c = neighbour
+            if maze[r][c] == wall_block:
+                continue
+
+            new_path = path + [neighbour]
+            q.put((neighbour, new_path))
+            visited.add(neighbour)
+    raise ValueError("path not found")
+
+
+def legacy_find_neighbours(maze: list, row: int, col: int):
+    neighbours = []
+    if row > 0:
+        neighbours.append((col, row - 1))
+    if row < len(maze[0]) - 1:
+        neighbours.append((col, row + 1))
+    if col > 0:
+        neighbours.append((col - 1, row))
+    if col < len(maze) - 1:
+        neighbours.append((col + 1, row))
+    return neighbours
+
+
+# runs func repeatedly for at least min_time seconds, returns seconds per call
+def timeit(func, min_time: float = 0.5):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+# maze with start on the left and finish on the right, same placement rules as Maze.add_start_finish
+def benchmark_maze(width: int, height: int, seed: int = 1):
+    rng = random.Random(seed)
+    grid = generate_maze(width, height, rng)
+    rows = [y for y in range(1, height - 1) if not grid.is_tile(1, y, "w")]
+    start = (1, rng.choice(rows))
+    rows = [y for y in range(1, height - 1) if not grid.is_tile(width - 2, y, "w")]
+    end = (width - 2, rng.choice(rows))
+    grid.set(*end, FINISH)
+    return grid, start, end
+
+
+def bench_bfs():
+    print("bfs start -> finish (ms per search)")
+    for width, height in SIZES:
+        grid, start, end = benchmark_maze(width, height)
+        legacy_maze = SimpleNamespace(maze=grid.to_lists())
+        path = find_path(grid, start, end)
+        assert [(y, x) for x, y in path] == legacy_path_finder(legacy_maze, start[::-1], end[::-1])
+
+        legacy = timeit(lambda: legacy_path_finder(legacy_maze, start[::-1], end[::-1]))
+        new = timeit(lambda: find_path(grid, start, end))
+        tile = timeit(lambda: find_path(grid, start, tile=FINISH))
+        distance = timeit(lambda: find_path(grid, start, tile=FINISH, distance_only=True))
+        print(f"  {width}x{height}, path length {len(path)}: legacy {legacy * 1000:.2f}, find_path {new * 1000:.2f}, "
+              f"by tile {tile * 1000:.2f}, distance_only {distance * 1000:.2f}, speedup {legacy / new:.1f}x")
+
+
+# maze with keys placed like Maze.add_questions does
+def benchmark_keys(grid: MazeGrid, rng: random.Random):
+    keys = set()
+    while len(keys) < max(grid.width * grid.height // 100 + 1, 2):
+        x, y = rng.randint(1, grid.width - 2), rng.randint(1, grid.height - 2)
+        if grid.get(x, y) in ("c", "p") and not {(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)} & keys:
+            grid.set(x, y, KEY)
+            keys.add((x, y))
+    return keys
+
+
+# greedy against exact key routes over the level sizes of the seed finder, exact is only worth it where it walks fewer
+# tiles, it searches 2 ** keys subsets so it stops at MAX_EXACT_KEYS
+def bench_keys():
+    print("key route of one level, 20 mazes a size (ms per level, tiles walked per level)")
+    for width, height in ((11, 7), (27, 15), (31, 17), (47, 25), (67, 35)):
+        levels = []
+        for seed in range(20):
+            grid, start, end = benchmark_maze(width, height, seed)
+            keys = benchmark_keys(grid, random.Random(seed))
+            levels.append((grid, PathOracle(grid), start, keys, end, len(keys) // 2))
+        line = f"  {width}x{height}, {len(levels[0][3])} keys:"
+        for exact in (False, True):
+            if exact and len(levels[0][3]) > MAX_EXACT_KEYS:
+                line += " exact over MAX_EXACT_KEYS"
+                break
+            routes = []
+            elapsed = timeit(lambda: routes.append([key_route(*level, exact) for level in levels])) / len(levels)
+            tiles = sum(sum(legs) + len(legs) for _, legs in routes[0]) / len(levels)
+            line += f" {'exact' if exact else 'greedy'} {elapsed * 1000:.3f} ms {tiles:.1f} tiles,"
+        print(line.rstrip(","))
+
+
+# pygame with a window that isn't shown, main is only imported by the benchmarks that draw
+def headless_window():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    import main
+    pygame.init()
+    main.WINDOW = pygame.display.set_mode((main.WIDTH, main.HEIGHT), pygame.SRCALPHA)
+    return pygame, main
+
+
+def bench_assets():
+    pygame, main = headless_window()
+    print("images (ms)")
+    names = ("wall.png", "path.png", "open_door_with_path.png", "closed_door_with_path.png", "key_with_path.png")
+    folder = os.path.join(os.path.dirname(os.path.abspath(main.__file__)), "game_files", "images")
+    # what every Maze and Player did before the asset cache
+    loading = timeit(lambda: [pygame.image.load(os.path.join(folder, name)) for name in names + ("saolin.png",)])
+    cached = timeit(lambda: main.Assets.image("wall.png"))
+    print(f"  image loads per level {loading * 1000:.3f}, cached {cached * 1000:.4f}")
+
+    for width, height in SIZES[:1]:
+        rng = random.Random(1)
+        level = timeit(lambda: main.Maze(width, height, rng))
+        print(f"  new {width}x{height} level (generation included) {level * 1000:.2f}, "
+              f"of which the old image loads were {loading / level:.0%}")
+        tiles = [(x * 20, y * 20) for y in range(height) for x in range(width)]
+        raw = pygame.image.load(os.path.join(folder, "wall.png"))
+        converted = main.Assets.image("wall.png")
+        blits = {}
+        for label, image in (("unconverted", raw), ("atlas", converted)):
+            blits[label] = timeit(lambda: main.WINDOW.blits([(image, tile) for tile in tiles], False))
+        print(f"  {len(tiles)} tile blits: unconverted {blits['unconverted'] * 1000:.2f}, "
+              f"converted atlas {blits['atlas'] * 1000:.2f}")
+
+
+# Maze.render_full as it was before the cached layer, one blit or rect per tile
+def legacy_render_full(main, maze, player):
+    pygame = sys.modules["pygame"]
+    x, y = (main.WIDTH // 2 - maze.width * maze.tile_size // 2,
+            (main.HEIGHT + maze.top_indent) // 2 - maze.height * maze.tile_size // 2)
+    pygame.draw.rect(main.WINDOW, main.COLORS["white"],
+                     (x - 2, y - 2, maze.width * maze.tile_size + 4, maze.height * maze.tile_size + 4), 2)
+    xx = x
+    for i in range(maze.height):
+        x = xx
+        for j in range(maze.width):
+            tile = maze.maze[i][j]
+            if abs(i - player.y) > player.view_distance or abs(j - player.x) > player.view_distance:
+                pygame.draw.rect(main.WINDOW, main.COLORS["black"], (x, y, 20, 20))
+            elif tile == "w":
+                main.WINDOW.blit(maze.wall, (x, y))
+            elif tile == "Q":
+                main.WINDOW.blit(maze.key, (x, y))
+            elif tile == "F":
+                main.WINDOW.blit(maze.door, (x, y))
+            else:
+                main.WINDOW.blit(maze.path, (x, y))
+            x += maze.tile_size
+        y += maze.tile_size
+    maze.render_guards(player)
+
+
+def bench_render():
+    pygame, main = headless_window()
+    print("render_full (ms per redraw), view distance 4 and full view")
+    for width, height in ((67, 35), (135, 71), (269, 141)):
+        maze = main.Maze(width, height, random.Random(1))
+        player = main.Level.start_level(main.Player(maze))
+        build = timeit(lambda: (setattr(maze, "layer", None), maze.get_layer()))
+        key = next(iter(maze.q_location))
+        patch = timeit(lambda: maze.change_tile(*key, "Q"))
+        line = f"  {width}x{height}: layer build {build * 1000:.2f}, tile patch {patch * 1000:.4f}"
+        for view_distance in (4, 101):
+            player.view_distance = view_distance
+            legacy = timeit(lambda: legacy_render_full(main, maze, player))
+            cached = timeit(lambda: maze.render_full(player))
+            line += f", view {view_distance}: legacy {legacy * 1000:.2f} cached {cached * 1000:.2f}"
+        print(line)
+
+
+def bench_text():
+    pygame, main = headless_window()
+    print("hud and button text (ms per frame)")
+    maze = main.Maze(67, 35, random.Random(1))
+    main.Player(maze)
+    game = main.Main
+    game.mode, game.current_level, game.total_levels, game.total_start, game.score = "Speedrun", 1, 5, 0, 0
+    game.level_start = 0
+    main.Level.keys, main.Level.required_keys = 0, len(maze.q_location) // 2
+    button = main.Button(0, 0, 300, 50, main.COLORS["black"], main.COLORS["light_grey"], 5, main.COLORS["white"],
+                         "Speedrun mode", 24)
+
+    # what level_info and Button.draw_text did before the caches: a SysFont for the small font and the button,
+    # every text rendered again
+    font = pygame.font.SysFont("arial", 24)
+
+    def legacy_frame():
+        small = pygame.font.SysFont("arial", 18)
+        for text in ("FPS: 140", "TOTAL TIME: 00: 12.", "level time: 00: 12.", "Total Score: 0", "Level: 1 / 5",
+                     "Guards: 3", "Mode: Speedrun", "Difficulty: Easy", "Keys: 0 / 12    Remaining keys: 24"):
+            font.render(text, True, main.COLORS["white"])
+        small.render("123", True, main.COLORS["white"])
+        small.render("456", True, main.COLORS["white"])
+        pygame.font.SysFont("arial", 24).render(button.text, True, main.COLORS["white"])
+
+    def frame():
+        game.level_info(maze)
+        button.draw(main.WINDOW)
+
+    legacy = timeit(legacy_frame)
+    main.Assets.text_hits = main.Assets.text_misses = 0
+    cached = timeit(frame)
+    hits, misses = main.Assets.text_hits, main.Assets.text_misses
+    print(f"  legacy text work {legacy * 1000:.3f}, level_info + button with the caches {cached * 1000:.3f}, "
+          f"text cache hit rate {hits / (hits + misses):.0%} ({hits} hits, {misses} misses)")
+
+
+def bench_vision():
+    pygame, main = headless_window()
+    print("one animation frame of a step, render_movement + Player.render (ms)")
+    maze = main.Maze(67, 35, random.Random(1))
+    player = main.Level.start_level(main.Player(maze))
+    player.x, player.y = maze.width // 2, maze.height // 2
+    for circle in (True, False):
+        main.Main.circle_square = circle
+        line = f"  {'circle' if circle else 'square'}:"
+        for difficulty in ("Easy", "Normal", "Hard"):
+            player.view_distance = main.Level.diff_to_number[difficulty]
+            main.Level.x = 0
+            whole = timeit(lambda: (maze.render_movement(player), player.render(7, 0)))
+            main.Level.x = 1
+            strip = timeit(lambda: (maze.render_movement(player), player.render(7, 0)))
+            line += f" {difficulty} whole view {whole * 1000:.3f} strip {strip * 1000:.3f},"
+        print(line[:-1])
+    main.Level.x = 0
+
+
+# one move of every guard towards the player: a path per guard (the oracle of a perfect maze or bfs) against one
+# flow field for all of them
+def bench_chase():
+    print("one move of all guards (ms per move, the flow field is built anew, steps is a move on a built one)")
+    for width, height in SIZES:
+        grid, start, end = benchmark_maze(width, height)
+        rng = random.Random(1)
+        free = [(x, y) for y in range(height) for x in range(width) if not grid.is_tile(x, y, "w")]
+        oracle = PathOracle(grid)
+        line = f"  {width}x{height}:"
+        for count in (3, 50, 500):
+            guards = rng.sample(free, count)
+            assert all(FlowField(grid, start).step(*guard) == (find_path(grid, guard, start) + [guard])[1]
+                       for guard in guards[:50])
+            tree = timeit(lambda: [oracle.path(guard, start) for guard in guards])
+            bfs = timeit(lambda: [find_path(grid, guard, start) for guard in guards], 0.2)
+
+            def flow():
+                field = FlowField(grid, start)
+                return [field.step(*guard) for guard in guards]
+
+            field = timeit(flow)
+            built = FlowField(grid, start)
+            steps = timeit(lambda: [built.step(*guard) for guard in guards])
+            line += f" {count} guards: oracle {tree * 1000:.2f} bfs {bfs * 1000:.2f} flow field {field * 1000:.2f} " \
+                    f"(steps {steps * 1000:.3f}),"
+        print(line[:-1])
+
+
+# building the sight lines of a maze and asking if a guard sees a tile, against the box test it replaced
+def bench_sight():
+    print("guard detection (ms to build, us per question)")
+    for width, height in SIZES:
+        grid, start, end = benchmark_maze(width, height)
+        rng = random.Random(1)
+        free = [(x, y) for y in range(height) for x in range(width) if not grid.is_tile(x, y, "w")]
+        pairs = [(rng.choice(free), rng.choice(free)) for _ in range(1000)]
+        build = timeit(lambda: SightLines(grid))
+        lines = SightLines(grid)
+        box = timeit(lambda: [abs(x - other_x) <= 20 and abs(y - other_y) <= 20
+                              for (x, y), (other_x, other_y) in pairs])
+        sight = timeit(lambda: [lines.sees(x, y, other_x, other_y, 20) for (x, y), (other_x, other_y) in pairs])
+        visible = sum(lines.right[i] - lines.left[i] + lines.bottom[i] - lines.top[i] + 1
+                      for i in (y * width + x for x, y in free)) / len(free)
+        print(f"  {width}x{height}: build {build * 1000:.2f}, box test {box * 1000:.3f}, sees {sight * 1000:.3f}, "
+              f"{visible:.1f} tiles seen from a tile on average")
+
+# a level full of guards: the guard ai of every tick over a minute of game time with the player standing in the middle,
+# the collision check of every tick and drawing the guards mid step
+def bench_horde():
+    pygame, main = headless_window()
+    from level import Level, Npc, GUARD_AI_BUDGET, TICK_LENGTH, MAX_TICKS_PER_FRAME
+    print(f"guard crowd (ms), ai budget {GUARD_AI_BUDGET} a frame, legacy collide is the scan over every guard")
+    for width, height in ((67, 35), (269, 141)):
+        for count in (3, 500, 2000):
+            maze = main.Maze(width, height, random.Random(1), guard_count=count)
+            player = Level.start_level(main.Player(maze))
+            player.x, player.y = maze.width // 2, maze.height // 2
+            Npc.update_player_coordinates(player)
+
+            # a minute of game time, the worst frame is the slowest MAX_TICKS_PER_FRAME ticks in a row
+            def run_ticks():
+                ticks = []
+                for _ in range(60000 // TICK_LENGTH):
+                    start = time.perf_counter()
+                    Level.scheduler.tick()
+                    ticks.append(time.perf_counter() - start)
+                return ticks, max(sum(ticks[i:i + MAX_TICKS_PER_FRAME]) for i in range(len(ticks)))
+
+            ticks, frame = run_ticks()
+            guards = list(zip(Npc.names, Npc.xs, Npc.ys))
+            legacy = timeit(lambda: next((name for name, x, y in guards if x == player.x and y == player.y), ""))
+            collide = timeit(lambda: Npc.collide(player))
+            Npc.elapsed_movement = Level.animation_length // 2
+            line = f"  {width}x{height}, {count} guards: ai tick mean {sum(ticks) / len(ticks) * 1000:.4f} " \
+                   f"max {max(ticks) * 1000:.3f}, worst frame {frame * 1000:.3f}, collide legacy {legacy * 1000:.4f} " \
+                   f"crowd {collide * 1000:.4f}, render"
+            for view_distance in (3, 101):
+                player.view_distance = view_distance
+                render = timeit(lambda: maze.render_guards(player))
+                line += f" view {view_distance} {render * 1000:.3f}"
+            # the rects of two frames with the guards half a step apart, sent by Display.update
+            frames = []
+            for elapsed in (Level.animation_length // 4, Level.animation_length * 3 // 4):
+                Npc.elapsed_movement = elapsed
+                main.Display.dirty = []
+                maze.render_guards(player)
+                frames.append(main.Display.dirty)
+            legacy = timeit(lambda: pygame.display.update(frames[1] + [rect for rect in frames[0]
+                                                                       if rect not in frames[1]]))
+
+            def update():
+                main.Display.previous, main.Display.dirty, main.Display.full = frames[0], list(frames[1]), False
+                main.Display.update()
+
+            update = timeit(update)
+            line += f", display update of {len(frames[0]) + len(frames[1])} rects legacy {legacy * 1000:.3f} " \
+                    f"deduped {update * 1000:.3f}"
+            # every guard chasing the player from anywhere in the maze
+            view_distance, Npc.view_distance = Npc.view_distance, width + height
+            Npc.alerted = set(range(count))
+            Npc.plan(player)
+            print(line + f", all chasing: worst frame {run_ticks()[1] * 1000:.3f}")
+            Npc.view_distance = view_distance
+
+
+# what the profiler adds to a frame of Main.level, a frame and its marks
+def bench_profiler():
+    from profiler import Profiler
+    print("profiler cost of one level frame (us)")
+    profile = Profiler.loop("benchmark")
+    sections = ("wait", "events", "ticks", "guard ai", "ticks", "maze", "guards", "player", "hud", "pause", "display")
+
+    def frame():
+        profile.frame()
+        for section in sections:
+            profile.mark(section)
+
+    for enabled in (False, True):
+        Profiler.enabled = enabled
+        print(f"  {'on' if enabled else 'off'}: {timeit(frame) * 1e6:.2f}")
+    Profiler.enabled = False
+    print(f"  percentiles of {len(profile.samples)} sections over {len(profile.samples['frame'])} frames: "
+          f"{timeit(profile.percentiles) * 1e6:.0f}")
+
+# level ticks without a window or any drawing, the player walks in a random direction for a while
+def bench_ticks():
+    import pygame
+    from level import Level, Player, TICK_LENGTH
+    from maze_core import Maze
+    print("headless level ticks (ticks per second)")
+    for width, height in ((31, 17), (67, 35)):
+        rng = random.Random(1)
+        maze = Maze(width, height, rng)
+        player = Level.start_level(Player(maze))
+        directions = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN)
+        ticks = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < 1:
+            keys = defaultdict(bool, {rng.choice(directions): True})
+            for _ in range(100):
+                ticks += 1
+                state = Level.level_tick(player, keys)
+                if state == "question":
+                    maze.change_tile(player.x, player.y, "p")
+                    maze.q_location.remove((player.x, player.y))
+                    Level.keys += 1
+                elif state:
+                    maze = Maze(width, height, rng)
+                    player = Level.start_level(Player(maze))
+        elapsed = time.perf_counter() - start
+        print(f"  {width}x{height}: {ticks / elapsed:.0f} ticks/s, "
+              f"{ticks / elapsed * TICK_LENGTH / 1000:.0f}x real time")
+
+
+# what recording adds to a frame of Main.level, and how fast a recorded speedrun is checked
+def bench_replay():
+    pygame, main = headless_window()
+    import simulation
+    print("speedrun replays")
+    keys_pressed = pygame.key.get_pressed()
+    recording = main.Recording(main.Level.animation_length)
+    recording.start_level()
+    record = timeit(lambda: (main.read_inputs(keys_pressed), main.Level.animation_length != recording.current_length,
+                             [main.Level.can_move["all"] and 0 != recording.inputs for _ in range(3)]))
+    print(f"  recording per frame (3 ticks) {record * 1e6:.2f} us, {record / (1 / 140):.3%} of a 140 fps frame")
+
+    for difficulty in ("Easy", "Normal"):
+        # first seed where walking straight for the keys gets past the guards
+        for seed in range(100):
+            results = simulation.run_speedrun(seed, difficulty, simulation.greedy_route)
+            if len(results) == 5 and results[-1]["state"] == "win":
+                break
+        # the same run again, this time recording the inputs the way Main.level does
+        recording = main.Recording(main.Level.speed_to_length["Normal"])
+        inputs = [0]
+
+        def policy(player, tick: int):
+            inputs[0] = simulation.greedy_route(player, tick)
+            if inputs[0] != recording.inputs:
+                recording.press(tick, inputs[0])
+            return inputs[0]
+
+        with simulation.headless(recording.animation_length):
+            rng = random.Random(seed)
+            for width, height in main.Level.speedrun_sizes(difficulty):
+                recording.start_level()
+                result = simulation.run_level(main.Maze(width, height, rng), policy,
+                                              lambda player: recording.answer(True) or True)
+                recording.end_level(result["ticks"])
+        text = recording.encode()
+        game_time = sum(result["time"] for result in results)
+        entry = {"time": game_time, "level times": str([str(result["time"]) for result in results]), "seed": seed,
+                 "replay": text}
+        assert simulation.verify_speedrun(entry, difficulty)
+        verify = timeit(lambda: simulation.verify_speedrun(entry, difficulty))
+        print(f"  {difficulty}, seed {seed}: {game_time:.1f} s of play, replay {len(text)} characters, "
+              f"verified in {verify * 1000:.1f} ms ({game_time / verify:.0f}x real time)")
+
+
+# in-memory stand-in for a pymongo database that counts round trips, only as much of the api as the syncs use
+class MemoryDatabase:
+    def __init__(self, latency: float = 0):
+        self.collections = {}
+        self.round_trips = 0
+        self.operations = []  # names of the collection methods of every round trip, in order
+        self.latency = latency  # seconds every round trip waits
+
+    def __getitem__(self, name: str):
+        return self.collections.setdefault(name, MemoryCollection(self))
+
+    def round_trip(self, operation: str):
+        self.round_trips += 1
+        self.operations.append(operation)
+        time.sleep(self.latency)
+
+
+class MemoryCollection:
+    def __init__(self, database: MemoryDatabase):
+        self.database = database
+        self.documents = {}
+
+    def find_one(self, query: dict):
+        self.database.round_trip("find_one")
+        document = self.documents.get(query["_id"])
+        return dict(document) if document else None
+
+    def find(self, query: dict):
+        self.database.round_trip("find")
+        return [dict(self.documents[i]) for i in query["_id"]["$in"] if i in self.documents]
+
+    def delete_one(self, query: dict):
+        self.database.round_trip("delete_one")
+        self.documents.pop(query["_id"], None)
+
+    def insert_one(self, document: dict):
+        self.database.round_trip("insert_one")
+        if document["_id"] in self.documents:
+            raise KeyError(f"duplicate _id {document['_id']}")
+        self.documents[document["_id"]] = dict(document)
+
+    # a ReplaceOne whose filter doesn't match the document with its _id fails like a duplicate key when it upserts
+    def bulk_write(self, operations: list, ordered: bool = True):
+        from pymongo.errors import BulkWriteError
+        self.database.round_trip("bulk_write")
+        errors = []
+        for index, operation in enumerate(operations):
+            ids = operation._filter["_id"]
+            if type(operation).__name__ == "ReplaceOne":
+                document = self.documents.get(ids)
+                if document is None or all(document.get(key) == value for key, value in operation._filter.items()):
+                    if document is not None or operation._upsert:
+                        self.documents[ids] = dict(operation._doc, _id=ids)
+                elif operation._upsert:
+                    errors.append({"index": index, "code": 11000, "errmsg": f"duplicate _id {ids}"})
+                    if ordered:
+                        break
+            else:
+                for i in ids["$in"]:
+                    self.documents.pop(i, None)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+# Database.sync_online as it was before leaderboards.py, one find_one, delete_one and insert_one per place
+def legacy_sync(collection, board: str, local: list):
+    my_list = [dict(entry) for entry in local]
+    for i in range(1, 10):
+        if x := collection.find_one({"_id": i}):
+            my_list.append(x)
+    for entry in my_list:
+        entry["_id"] = entry["place"] = 0
+    my_list = [dict(t) for t in {tuple(d.items()) for d in my_list}]
+    if board.startswith("speedrun"):
+        my_list.sort(key=lambda item: item["time"])
+    else:
+        my_list.sort(key=lambda item: item["score"], reverse=True)
+    my_list = my_list[:9]
+    for x, entry in enumerate(my_list):
+        entry["_id"] = entry["place"] = x + 1
+    for i in range(1, 10):
+        collection.delete_one({"_id": i})
+        collection.insert_one(my_list[i - 1])
+
+
+def bench_sync():
+    import main
+    from leaderboards import Leaderboards, BOARDS
+    print("online highscores sync of all boards, round trips (time at 50 ms per round trip)")
+    boards = {board: main.Main.highscores[board] for board in BOARDS}
+    legacy, new = MemoryDatabase(), MemoryDatabase()
+    for name, database in (("legacy", legacy), ("leaderboards", new)):
+        for sync in ("first", "nothing new", "one new score"):
+            if sync == "one new score":
+                boards["speedrun_easy"] = boards["speedrun_easy"][:-1] + [
+                    dict(boards["speedrun_easy"][-1], name="new", time=1, token=0)]
+            database.round_trips = 0
+            if name == "legacy":
+                for board, local in boards.items():
+                    legacy_sync(database[board], board, local)
+            else:
+                Leaderboards(database).sync(boards)
+            print(f"  {name}, {sync}: {database.round_trips} ({database.round_trips * 0.05:.1f} s)")
+        boards = {board: main.Main.highscores[board] for board in BOARDS}
+    # the same places, leaderboards also keeps an etag in _id 0
+    assert {board: collection.documents for board, collection in legacy.collections.items()} == \
+        {board: {i: entry for i, entry in collection.documents.items() if i} for board, collection in
+         new.collections.items()}
+
+
+# someone browsing the online boards for 10 minutes with another game writing to them now and then
+def bench_cache():
+    import main
+    import leaderboards
+    from leaderboards import Leaderboards, BoardCache, BOARDS
+    print("online highscores menu, 60 board opens over 10 minutes, 20 ms per round trip")
+    database = MemoryDatabase()
+    other_game = Leaderboards(database)
+    other_game.sync({board: main.Main.highscores[board] for board in BOARDS})
+    database.latency = 0.02
+    rng = random.Random(1)
+    opens = [(rng.uniform(0, 600), rng.choice(BOARDS[:4])) for _ in range(60)]
+    writes = [(rng.uniform(0, 600), rng.choice(BOARDS[:4])) for _ in range(5)]
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_cache.json")
+
+    now = [0]
+    real_time = leaderboards.time
+    leaderboards.time = SimpleNamespace(time=lambda: now[0], perf_counter=time.perf_counter)
+    try:
+        for name in ("no cache", "cache"):
+            cache = BoardCache(path)
+            database.round_trips = 0
+            waited = 0
+            events = sorted([(at, "open", board) for at, board in opens]
+                            + [(at, "write", board) for at, board in writes])
+            for at, kind, board in events:
+                now[0] = at
+                if kind == "write":
+                    etag, entries = other_game.read(board)
+                    entries[-1] = dict(entries[-1], name=f"other {at:.0f}")
+                    other_game.write(board, entries, etag)
+                    continue
+                start = time.perf_counter()
+                if name == "cache":
+                    cache.get(other_game, board)
+                else:
+                    other_game.fetch(board)
+                waited += time.perf_counter() - start
+            # the other game's writes are 10 of the round trips
+            line = f"  {name}: {database.round_trips} round trips, {waited * 1000 / len(opens):.1f} ms per open"
+            if name == "cache":
+                stats = cache.stats()
+                line += f", hit rate {stats['hit rate']:.0%} ({stats['hits']} hits, {stats['revalidated']} same " \
+                        f"etag, {stats['misses']} fetches), {stats['latency']:.1f} ms per query"
+            print(line)
+        # the next session starts from the file
+        print(f"  boards cached on disk for the next start: {len(BoardCache(path).boards)}")
+    finally:
+        leaderboards.time = real_time
+        os.remove(path)
+
+
+BENCHMARKS = {
+    "bfs": bench_bfs,
+    "keys": bench_keys,
+    "assets": bench_assets,
+    "render": bench_render,
+    "text": bench_text,
+    "vision": bench_vision,
+    "chase": bench_chase,
+    "sight": bench_sight,
+    "horde": bench_horde,
+    "ticks": bench_ticks,
+    "profiler": bench_profiler,
+    "replay": bench_replay,
+    "sync": bench_sync,
+    "cache": bench_cache,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
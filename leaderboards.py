@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import deque
+
+# online highscores: every board is a collection of the "highscores" database, its places are documents with _id 1 to 9
+# and _id 0 holds the etag, a new one is written with every change of the board
+# a sync reads a board with one query, merges it with the local board and writes it back with one bulk_write
+# the write only goes through if the etag is still the one that was read, otherwise the board is read and merged again
+# only needs something that acts like a pymongo database, so it runs the same against a local stand-in
+
+BOARD_SIZE = 9
+BOARD_TTL = 60  # seconds a cached board is shown without asking the database
+# seconds after which a cached board is fetched again even with the same etag, older versions of the game change boards
+# without writing one
+BOARD_MAX_AGE = 3600
+BOARDS = ("endless_all", "endless_all_custom", "speedrun_easy", "speedrun_easy_custom", "speedrun_normal",
+          "speedrun_normal_custom", "speedrun_hard", "speedrun_hard_custom", "speedrun_full view",
+          "speedrun_full view_custom")
+WRITE_ATTEMPTS = 5  # reads, merges and writes of a board before a sync gives up on it
+WRITE_WAIT = 0.2  # seconds a sync waits for a board another client is writing, the last attempt writes it anyway
+
+
+# board of a game mode ("speedrun" or "endless"), difficulty and seed type ("random" or "custom")
+def board_name(game_mode: str, difficulty: str, seed: str):
+    board = f"{game_mode}_{difficulty.lower()}" if game_mode == "speedrun" else f"{game_mode}_all"
+    return board + ("" if seed == "random" else "_custom")
+
+
+# local and remote entries together, the same entry only once, the best BOARD_SIZE of them with _id and place set
+def merge(board: str, local: list, remote: list):
+    entries = {}
+    for entry in local + remote:
+        entry = dict(entry, _id=0, place=0)
+        entries.setdefault(tuple(sorted(entry.items())), entry)
+    if board.startswith("speedrun"):
+        merged = sorted(entries.values(), key=lambda item: item["time"])
+    else:
+        merged = sorted(entries.values(), key=lambda item: item["score"], reverse=True)
+    merged = merged[:BOARD_SIZE]
+    for place, entry in enumerate(merged, 1):
+        entry["_id"] = entry["place"] = place
+    return merged
+
+
+# True if the bulk_write of Leaderboards.write stopped because the etag wasn't the one the board was read with
+def is_conflict(error):
+    return any(each.get("index") == 0 and each.get("code") == 11000 for each in error.details.get("writeErrors", ()))
+
+
+class Leaderboards:
+    def __init__(self, database):
+        self.database = database
+
+    # (_id 0 document or {} if the board has none, entries of the board by place), one round trip
+    def documents(self, board: str):
+        documents = self.database[board].find({"_id": {"$in": list(range(BOARD_SIZE + 1))}})
+        head = {}
+        entries = []
+        for document in documents:
+            if document["_id"] == 0:
+                head = document
+            else:
+                entries.append(document)
+        return head, sorted(entries, key=lambda entry: entry["_id"])
+
+    # (etag or None, entries of the board by place), one round trip
+    # a board that is being written has no etag yet, so nobody keeps half of it under the new one
+    def read(self, board: str):
+        head, entries = self.documents(board)
+        return None if head.get("writing") else head.get("etag"), entries
+
+    def fetch(self, board: str):
+        return self.read(board)[1]
+
+    # just the etag, a small query to find out if the board changed
+    def etag(self, board: str):
+        document = self.database[board].find_one({"_id": 0})
+        return document.get("etag") if document and not document.get("writing") else None
+
+    # the entries replace the whole board in one round trip if its etag is still the given one (None for a new board),
+    # places they don't fill are emptied, returns the new etag
+    # the new etag is swapped in first and marked as writing until the places are written, if the board has another
+    # etag by then the swap hits the existing _id 0, the ordered bulk_write stops there and raises BulkWriteError
+    def write(self, board: str, entries: list, etag: str):
+        from pymongo import ReplaceOne, DeleteMany  # pymongo is only needed once the game connects
+        new_etag = uuid.uuid4().hex
+        operations = [ReplaceOne({"_id": 0, "etag": etag}, {"_id": 0, "etag": new_etag, "writing": True}, upsert=True)]
+        operations += [ReplaceOne({"_id": entry["_id"]}, entry, upsert=True) for entry in entries]
+        if len(entries) < BOARD_SIZE:
+            operations.append(DeleteMany({"_id": {"$in": list(range(len(entries) + 1, BOARD_SIZE + 1))}}))
+        operations.append(ReplaceOne({"_id": 0, "etag": new_etag}, {"_id": 0, "etag": new_etag}))
+        self.database[board].bulk_write(operations, ordered=True)
+        return new_etag
+
+    # merges {board: local entries} into the online boards, boards that come out the same aren't written
+    # a board another client wrote between the read and the write is read, merged and written again
+    # returns {board: (etag, merged entries)}
+    def sync(self, boards: dict):
+        from pymongo.errors import BulkWriteError
+        merged = {}
+        for board, local in boards.items():
+            for attempt in range(1, WRITE_ATTEMPTS + 1):
+                head, remote = self.documents(board)
+                if head.get("writing") and attempt < WRITE_ATTEMPTS:
+                    time.sleep(WRITE_WAIT)
+                    continue
+                etag = head.get("etag")
+                entries = merge(board, local, remote)
+                if entries == remote and not head.get("writing"):
+                    break
+                try:
+                    etag = self.write(board, entries, etag)
+                    break
+                except BulkWriteError as error:
+                    if attempt == WRITE_ATTEMPTS or not is_conflict(error):
+                        raise
+            merged[board] = (etag, entries)
+        return merged
+
+
+# online boards kept on disk between sessions, read through: a board younger than BOARD_TTL comes straight from here,
+# an older one only gets fetched again when its etag changed
+class BoardCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.boards = self.load()  # {board: {"etag", "entries", "fetched", "checked"}}, times from time.time()
+        self.lock = threading.Lock()  # boards change on the network thread while the menu peeks at them
+        self.hits = 0  # younger than BOARD_TTL
+        self.revalidated = 0  # older, the etag was still the same
+        self.misses = 0  # fetched
+        self.latencies = deque(maxlen=100)  # ms of the last etag checks and fetches
+
+    def load(self):
+        try:
+            with open(self.path, "rt", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self):
+        with self.lock:
+            with open(self.path + ".tmp", "wt", encoding="utf-8") as file:
+                json.dump(self.boards, file)
+            os.replace(self.path + ".tmp", self.path)
+
+    # whatever is cached, however old, None if the board never was
+    def peek(self, board: str):
+        with self.lock:
+            cached = self.boards.get(board)
+            return cached["entries"] if cached else None
+
+    # True if the cached board was checked with the database less than BOARD_TTL ago
+    def fresh(self, board: str):
+        with self.lock:
+            cached = self.boards.get(board)
+            return cached is not None and time.time() - cached["checked"] < BOARD_TTL
+
+    def put(self, board: str, etag: str, entries: list):
+        now = time.time()
+        with self.lock:
+            self.boards[board] = {"etag": etag, "entries": entries, "fetched": now, "checked": now}
+        self.save()
+
+    # entries of the board, asks the database only when the cached ones are too old
+    def get(self, leaderboards: Leaderboards, board: str):
+        with self.lock:
+            cached = self.boards.get(board)
+        now = time.time()
+        if cached and now - cached["checked"] < BOARD_TTL:
+            self.hits += 1
+            return cached["entries"]
+
+        start = time.perf_counter()
+        if cached and cached["etag"] and now - cached["fetched"] < BOARD_MAX_AGE:
+            same = leaderboards.etag(board) == cached["etag"]
+            self.latencies.append((time.perf_counter() - start) * 1000)
+            if same:
+                self.revalidated += 1
+                with self.lock:
+                    cached["checked"] = now
+                self.save()
+                return cached["entries"]
+            start = time.perf_counter()
+        etag, entries = leaderboards.read(board)
+        self.latencies.append((time.perf_counter() - start) * 1000)
+        self.misses += 1
+        self.put(board, etag, entries)
+        return entries
+
+    # {"hit rate": share of gets answered without fetching the board, "latency": average ms of a database query}
+    def stats(self):
+        gets = self.hits + self.revalidated + self.misses
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses,
+                "hit rate": (self.hits + self.revalidated) / gets if gets else 0,
+                "latency": sum(self.latencies) / len(self.latencies) if self.latencies else 0}
@@ -0,0 +1,385 @@
+import heapq
+import random
+import zlib
+from array import array
+import pygame
+import maze_core
+from profiler import Profiler
+
+# the rules of a level without anything drawn: the player's steps, the keys, the guards and the ticks of game time
+# Main.level draws the level and gives it the keyboard, simulation.py plays it headless with a policy, both through
+# Level.start_level and Level.level_tick, the same maze and inputs always give the same run
+
+TICK_LENGTH = 5  # ms of game time simulated per tick of the level loop
+MAX_TICKS_PER_FRAME = 20  # a frame that took longer than this many ticks slows the game down instead
+NPC_MOVE_INTERVAL = 2000  # ms between guard steps
+NPC_UPDATE_POS_INTERVAL = 9000  # ms between the guards finding out where the player is
+# most guard ai work (tiles of the chase bfs plus guards deciding their next step) a frame can cost, Npc.think gets
+# its share of it every tick and saves up what it doesn't use to half of it, so even a frame of MAX_TICKS_PER_FRAME
+# ticks stays under it, work that doesn't fit waits
+GUARD_AI_BUDGET = 2000
+MAX_CHASERS = 250  # alerted guards that plan a step for a move, the closest ones, the others wait for the next move
+MAX_WANDERERS = 500  # other guards that take a random step in a move, so a move also costs the same with any crowd
+NPC_WANDER_MOVES = 2  # a guard that doesn't chase the player wanders once every this many moves, less in big crowds
+
+
+# runs the level in fixed ticks of game time no matter the frame rate, frames only draw where things are between two
+# ticks, timers are counted in game time too
+class Scheduler:
+    def __init__(self):
+        self.time = 0  # ms of game time
+        self.lag = 0  # ms of real time not simulated yet, always less than a tick
+        self.timers = []  # [game time of the next call, interval, func]
+
+    def every(self, interval: int, func):
+        self.timers.append([self.time + interval, interval, func])
+
+    # how many ticks to run for ms of real time
+    def advance(self, ms: int):
+        ticks, self.lag = divmod(self.lag + ms, TICK_LENGTH)
+        return min(ticks, MAX_TICKS_PER_FRAME)
+
+    def tick(self):
+        self.time += TICK_LENGTH
+        for timer in self.timers:
+            if self.time >= timer[0]:
+                timer[0] += timer[1]
+                timer[2]()
+
+
+# where the player is and how they step, main.Player draws them
+class Player:
+    def __init__(self, maze: maze_core.Maze):
+        self.x, self.y = maze.start
+        self.score = 0
+        self.maze = maze
+
+    def movement(self, keys_pressed):
+        if (keys_pressed[pygame.K_a] or keys_pressed[pygame.K_LEFT]) and not self.maze.is_tile(self.x - 1, self.y, "w"):
+            Level.x -= 1
+        elif (keys_pressed[pygame.K_d] or keys_pressed[pygame.K_RIGHT]) and not self.maze.is_tile(self.x + 1, self.y,
+                                                                                                  "w"):
+            Level.x += 1
+        elif (keys_pressed[pygame.K_w] or keys_pressed[pygame.K_UP]) and not self.maze.is_tile(self.x, self.y - 1, "w"):
+            Level.y -= 1
+        elif (keys_pressed[pygame.K_s] or keys_pressed[pygame.K_DOWN]) and not self.maze.is_tile(self.x, self.y + 1,
+                                                                                                 "w"):
+            Level.y += 1
+        else:
+            return None
+        Level.can_move["all"] = False
+        Level.elapsed_movement = 0
+
+
+# class defining non player characters
+class Npc:
+    # the guards of the level as a crowd, a guard is an index into the parallel arrays
+    # every tile of the maze knows the first guard standing on it and every guard the next and previous one on its tile,
+    # so finding the guards on a tile doesn't depend on how many there are
+    # a guard that sees the player along a straight corridor is alerted and chases player_coordinates until they get
+    # further than view_distance away in either direction
+    # guards think ahead of their steps: whenever they or player_coordinates move, the guards that see the player are
+    # found from the sight lines of the player's tile and think spreads planning the next step of the alerted ones over
+    # the ticks until the move, the other guards wander at a slower rate with whatever budget the chase leaves
+    player_coordinates = (0, 0)
+    elapsed_movement = 0
+    can_kill = True
+    moved = False  # the guards finished a step and need drawing once more
+    flow_field = None  # steps to player_coordinates, one bfs shared by all the guards
+    view_distance = 20  # furthest a guard sees along a corridor
+    maze = None
+    names = []
+    xs, ys = array("i"), array("i")
+    old_xs, old_ys = array("i"), array("i")  # where the guards started their last step
+    first = array("i")  # per tile, -1 if no guard stands there
+    next, previous = array("i"), array("i")  # per guard, -1 at the ends of the guards on a tile
+    came_from = array("i")  # per guard, tile it wandered from last, -1 before it wandered
+    alerted = set()  # guards chasing player_coordinates
+    pending = []  # alerted guards that still need to plan their step, closest last
+    planned = []  # [(guard, x, y), ...] steps for the next move
+    stepped = []  # guards that stepped in the last move
+    wander_next = 0  # guard think looks at next for wandering, goes round all of them over the moves
+    wander_left = 0  # guards think may still look at for wandering before the move, the alerted ones are skipped
+    budget = GUARD_AI_BUDGET // 2  # work think has saved up
+    rng = random.Random()  # of the wandering, seeded from the maze so a level always plays the same
+    alarm = False  # a planned guard is close to the player
+    ring = False  # the alarm went off with the last move, Main.level plays it and sets this back
+
+    # guards are [(name, x, y), ...] from Maze.add_guards
+    @classmethod
+    def spawn(cls, maze: maze_core.Maze, guards: list):
+        cls.clear()
+        cls.maze = maze
+        cls.rng = random.Random(zlib.crc32(maze.maze.tiles))
+        cls.first = array("i", [-1]) * (maze.width * maze.height)
+        for name, x, y in guards:
+            cls.names.append(name)
+            cls.xs.append(x)
+            cls.ys.append(y)
+            cls.next.append(-1)
+            cls.previous.append(-1)
+            cls.came_from.append(-1)
+            cls.place(len(cls.names) - 1)
+        cls.old_xs, cls.old_ys = array("i", cls.xs), array("i", cls.ys)
+
+    @classmethod
+    def clear(cls):
+        cls.names = []
+        cls.xs, cls.ys, cls.old_xs, cls.old_ys = array("i"), array("i"), array("i"), array("i")
+        cls.first, cls.next, cls.previous, cls.came_from = array("i"), array("i"), array("i"), array("i")
+        cls.pending, cls.planned, cls.stepped = [], [], []
+        cls.alerted = set()
+        cls.wander_next = cls.wander_left = 0
+        cls.budget = GUARD_AI_BUDGET // 2
+        cls.maze = cls.flow_field = None
+        cls.alarm = cls.ring = False
+
+    # puts the guard in front of the guards on its tile
+    @classmethod
+    def place(cls, guard: int):
+        tile = cls.ys[guard] * cls.maze.width + cls.xs[guard]
+        cls.next[guard], cls.previous[guard] = cls.first[tile], -1
+        if cls.first[tile] != -1:
+            cls.previous[cls.first[tile]] = guard
+        cls.first[tile] = guard
+
+    @classmethod
+    def lift(cls, guard: int):
+        after, before = cls.next[guard], cls.previous[guard]
+        if before == -1:
+            cls.first[cls.ys[guard] * cls.maze.width + cls.xs[guard]] = after
+        else:
+            cls.next[before] = after
+        if after != -1:
+            cls.previous[after] = before
+
+    # guards that see the tile (player_x, player_y), its row and column as far as the corridors and view_distance go
+    @classmethod
+    def in_sight(cls, player_x: int, player_y: int):
+        width, distance, first, next_guard = cls.maze.width, cls.view_distance, cls.first, cls.next
+        lines, tile = cls.maze.get_sight_lines(), player_y * width + player_x
+        left, right = max(lines.left[tile], player_x - distance), min(lines.right[tile], player_x + distance)
+        top, bottom = max(lines.top[tile], player_y - distance), min(lines.bottom[tile], player_y + distance)
+        # the tile of the player is in the row, not the column
+        seen = first[player_y * width + left:player_y * width + right + 1] + \
+            first[top * width + player_x:tile:width] + first[tile + width:bottom * width + player_x + 1:width]
+        guards = []
+        if seen.count(-1) != len(seen):
+            for guard in seen:
+                while guard != -1:
+                    guards.append(guard)
+                    guard = next_guard[guard]
+        return guards
+
+    # forgets the planned steps, guards that see the player join the chase and tell the others where the player is,
+    # the ones too far from player_coordinates lose track and the closest MAX_CHASERS alerted ones plan again
+    @classmethod
+    def plan(cls, player: Player):
+        seen = cls.in_sight(player.x, player.y) if cls.maze else []
+        if seen:
+            cls.player_coordinates = (player.x, player.y)
+        player_x, player_y = cls.player_coordinates
+        xs, ys, distance = cls.xs, cls.ys, cls.view_distance
+        cls.alerted = {guard for guard in cls.alerted
+                       if abs(xs[guard] - player_x) <= distance and abs(ys[guard] - player_y) <= distance}
+        cls.alerted.update(seen)
+        cls.pending = heapq.nsmallest(MAX_CHASERS, cls.alerted, key=lambda guard: (
+            abs(xs[guard] - player_x) + abs(ys[guard] - player_y), guard))
+        cls.pending.reverse()
+        cls.wander_left = min(-(-len(cls.names) // NPC_WANDER_MOVES), MAX_WANDERERS)
+        cls.planned = []
+        cls.alarm = False
+
+    # guard ai of one tick, plans steps of the pending guards and then of the wanderers until the saved up budget is
+    # used up, a unit is a tile of the chase bfs or one guard, guards not planned by the move stay where they are for it
+    @classmethod
+    def think(cls):
+        cls.budget = budget = min(cls.budget + GUARD_AI_BUDGET // (2 * MAX_TICKS_PER_FRAME), GUARD_AI_BUDGET // 2)
+        pending, xs, ys = cls.pending, cls.xs, cls.ys
+        if not pending and not cls.wander_left:
+            return
+        Level.profile.mark("ticks")
+        while pending and budget > 0:
+            field = cls.chase_field()
+            guard = pending[-1]
+            x, y = xs[guard], ys[guard]
+            if not field.reached(x, y):
+                budget -= field.expand(budget)
+                continue
+            pending.pop()
+            budget -= 1
+            steps = field.steps(x, y)
+            cls.alarm = cls.alarm or 0 <= steps < 30
+            if steps > 0:
+                cls.planned.append((guard, *field.step(x, y)))
+            elif steps == -1:
+                cls.alerted.discard(guard)  # can't get there
+        while budget > 0 and cls.wander_left:
+            guard = cls.wander_next
+            cls.wander_next = (guard + 1) % len(cls.names)
+            cls.wander_left -= 1
+            if guard not in cls.alerted:
+                budget -= 1
+                cls.planned.append((guard, *cls.wander(guard)))
+        cls.budget = budget
+        Level.profile.mark("guard ai")
+
+    # random open tile next to the guard, back where it wandered from only at a dead end
+    @classmethod
+    def wander(cls, guard: int):
+        x, y, width, maze = cls.xs[guard], cls.ys[guard], cls.maze.width, cls.maze
+        steps = [step for step in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)) if not maze.is_tile(*step, "w")]
+        forward = [step for step in steps if step[1] * width + step[0] != cls.came_from[guard]]
+        cls.came_from[guard] = y * width + x
+        return cls.rng.choice(forward or steps or [(x, y)])
+
+    # every planned guard takes its step, the chasing ones closer to where they think the player is (player_coordinates,
+    # NPCs vision is delayed) whereas player contains actual position
+    @classmethod
+    def move_all_npc(cls, player: Player):
+        Level.profile.mark("ticks")
+        xs, ys, old_xs, old_ys = cls.xs, cls.ys, cls.old_xs, cls.old_ys
+        for guard in cls.stepped:
+            old_xs[guard], old_ys[guard] = xs[guard], ys[guard]
+        cls.stepped = []
+        for guard, x, y in cls.planned:
+            cls.lift(guard)
+            xs[guard], ys[guard] = x, y
+            cls.place(guard)
+            cls.stepped.append(guard)
+
+        if cls.alarm:
+            cls.ring = True
+        cls.plan(player)
+        cls.elapsed_movement = 0
+        cls.can_kill = False
+        Level.profile.mark("guard ai")
+
+    # checks for collision with player, return npc name or empty string
+    @classmethod
+    def collide(cls, player: Player):
+        guard = cls.first[player.y * cls.maze.width + player.x] if cls.maze else -1
+        return cls.names[guard] if guard != -1 else ""
+
+    @classmethod
+    def is_any_npc(cls, x: int, y: int):
+        return bool(cls.maze) and cls.first[y * cls.maze.width + x] != -1
+
+    @classmethod
+    def update_player_coordinates(cls, player: Player):
+        Level.profile.mark("ticks")
+        cls.player_coordinates = (player.x, player.y)
+        cls.plan(player)
+        Level.profile.mark("guard ai")
+
+    # grown by think after the coordinates changed, only as far as the alerted guards need it
+    @classmethod
+    def chase_field(cls):
+        if cls.flow_field is None or cls.flow_field.target != cls.player_coordinates:
+            cls.flow_field = maze_core.FlowField(cls.maze.maze, cls.player_coordinates, complete=False)
+        return cls.flow_field
+
+
+# the state of the level being played, a class like Main so the drawing reads it straight from here
+class Level:
+    diff_to_number = {
+        "Easy": 4,
+        "Normal": 3,
+        "Hard": 2,
+        "Full view": 0
+    }
+    speed_to_length = {
+        "Slow": 200,
+        "Normal": 150,
+        "Fast": 100
+    }
+    can_move = {
+        "all": True,
+        "left": True,
+        "right": True,
+        "up": True,
+        "down": True
+    }
+    x = 0  # step of the player in progress
+    y = 0
+    elapsed_movement = 0
+    animation_length = speed_to_length["Normal"]  # in milliseconds, Main sets it from the player speed setting
+    redraw = False  # the player finished a step and needs drawing once more
+    keys = 0
+    required_keys = 0
+    scheduler: Scheduler  # of the level being played
+    profile = Profiler.loop("level")  # frames of Main.level, the guard ai marks its sections too
+
+    # the key the player stands on is used up, it only counts when the question was answered right
+    @classmethod
+    def take_key(cls, player: Player, correct: bool):
+        if correct:
+            cls.keys += 1
+        player.maze.change_tile(player.x, player.y, "p")
+        player.maze.q_location.remove((player.x, player.y))
+        if cls.keys >= cls.required_keys:
+            player.maze.open_exit()
+
+    # (width, height) of every speedrun level
+    @classmethod
+    def speedrun_sizes(cls, difficulty: str):
+        if difficulty == "Full view":
+            return [(15 + 12 * i, 9 + 6 * i) for i in range(5)]
+        width = 91 - cls.diff_to_number[difficulty] * 20
+        height = 47 - cls.diff_to_number[difficulty] * 10
+        return [(width + 4 * i, height + 2 * i) for i in range(5)]
+
+    # everything a level needs before the first tick, the player stands at the start of their maze, returns them
+    @classmethod
+    def start_level(cls, player: Player):
+        maze = player.maze
+        cls.required_keys = len(maze.q_location) // 2
+        cls.keys = 0
+        cls.can_move["all"] = True  # hopefully fixed the bug when sometimes you can die and next run you cant move
+        cls.x = cls.y = cls.elapsed_movement = 0
+        cls.redraw = False
+
+        Npc.spawn(maze, maze.guards)
+        Npc.elapsed_movement = 0
+        Npc.can_kill = True
+        Npc.moved = False
+        Npc.update_player_coordinates(player)
+        cls.scheduler = Scheduler()
+        cls.scheduler.every(NPC_UPDATE_POS_INTERVAL, lambda: Npc.update_player_coordinates(player))
+        # between the two, a move gets what was planned on its own tick
+        cls.scheduler.every(TICK_LENGTH, Npc.think)
+        cls.scheduler.every(NPC_MOVE_INTERVAL, lambda: Npc.move_all_npc(player))
+        return player
+
+    # one tick of game time, returns "win", "lose", "Q" (lost, not enough keys left), "question" or None
+    @classmethod
+    def level_tick(cls, player: Player, keys_pressed):
+        maze = player.maze
+        if cls.can_move["all"]:
+            player.movement(keys_pressed)
+        if cls.x or cls.y:
+            cls.elapsed_movement = min(cls.elapsed_movement + TICK_LENGTH, cls.animation_length)
+            if cls.elapsed_movement == cls.animation_length:
+                player.x += cls.x
+                player.y += cls.y
+                cls.x = cls.y = 0
+                cls.elapsed_movement = 0
+                cls.can_move["all"] = True
+                cls.redraw = True
+
+        if not Npc.can_kill:
+            Npc.elapsed_movement = min(Npc.elapsed_movement + TICK_LENGTH, cls.animation_length)
+            if Npc.elapsed_movement == cls.animation_length:
+                Npc.can_kill = True
+                Npc.moved = True
+        cls.scheduler.tick()
+
+        if maze.is_tile(player.x, player.y, "F") and cls.keys / cls.required_keys >= 1:
+            return "win"
+        if Npc.collide(player) and Npc.can_kill:
+            return "lose"
+        if cls.keys + len(maze.q_location) < cls.required_keys:
+            return "Q"
+        if (player.x, player.y) in maze.q_location:
+            return "question"
+        return None
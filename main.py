@@ -1,20 +1,27 @@
 import copy
+from collections import OrderedDict
+from concurrent.futures import Future
+import queue
+import threading
 import sys
 import os
 import random
-import queue
 import json
 import socket
 from datetime import datetime, timezone
 import webbrowser
 import logging
 import pygame
-from dotenv import main
-import pymongo
-from pymongo import MongoClient
-
-pygame.init()
-main.load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "variables.env"))
+from dotenv import load_dotenv
+import maze_core
+from maze_core import WALL_CODE, FINISH_CODE, KEY_CODE
+from replay import Recording, read_inputs
+from leaderboards import Leaderboards, BoardCache, BOARDS, board_name
+from outbox import Outbox
+from profiler import Profiler
+import level
+from level import Level, Npc, TICK_LENGTH
+from simulation import verify_speedrun
 
 # for type hints
 RGB = tuple[int, int, int]
@@ -23,17 +30,15 @@ RGB = tuple[int, int, int]
 VERSION = "2.0.2"
 CONNECTED = False
 ERROR_MESSAGE = "Oops... Looks like an error occurred, please send the error data. Then you can try restarting the app"
-IP_ADDRESS = socket.gethostbyname(socket.gethostname())
-CONNECTION_TO_DATABASE = os.environ["CONECTION_TO_DATABASE"]
 WIDTH = 1376
 HEIGHT = 774
 MAX_MAZE_WIDTH = 67
 MAX_MAZE_HEIGHT = 35
 MAX_NAME_LENGTH = 20
-MOVE = pygame.USEREVENT + 1
-NPC_MOVE = pygame.USEREVENT + 2
-NPC_UPDATE_POS = pygame.USEREVENT + 3
-NPC_RENDER = pygame.USEREVENT + 4
+TEXT_CACHE_SIZE = 256  # rendered texts kept by Assets.text
+NETWORK_TIMEOUT = 10  # seconds a screen waits for the database before giving up
+STALE_BOARD_WAIT = 1  # seconds the online highscores wait for a newer board before showing the cached one
+OUTBOX_CHECK_INTERVAL = 1  # seconds the network thread waits for a request before it retries the outbox
 COLORS = {
     "white": (255, 255, 255),
     "black": (0, 0, 0),
@@ -50,98 +55,215 @@ COLORS = {
 
 if __name__ == "__main__":
     # creating game window, and other stuff
+    pygame.init()
     WINDOW = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SRCALPHA)
     pygame.display.set_caption(f"THE MAZE {VERSION}")
 
 # sounds
-ALARM_SOUND = pygame.mixer.Sound(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                              "game_files", "sounds", "ALARM.wav"))
-CORRECT_QUESTION = pygame.mixer.Sound(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                                   "game_files", "sounds", "correct_q.wav"))
-WRONG_QUESTION = pygame.mixer.Sound(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                                 "game_files", "sounds", "incorrect_q.wav"))
-LEVEL_WIN = pygame.mixer.Sound(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                            "game_files", "sounds", "win_level.wav"))
-LEVEL_LOSE = pygame.mixer.Sound(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                             "game_files", "sounds", "prohra.wav"))
+ALARM_SOUND = "ALARM.wav"
+CORRECT_QUESTION = "correct_q.wav"
+WRONG_QUESTION = "incorrect_q.wav"
+LEVEL_WIN = "win_level.wav"
+LEVEL_LOSE = "prohra.wav"
+
+
+# images, sounds, fonts and rendered texts, made once on first use so importing this file doesn't need the mixer
+# or the disk, everyone gets the same surfaces so nothing may draw onto them
+class Assets:
+    images = {}
+    sounds = {}
+    fonts = {}  # (name, size) -> font, SysFont looks through the system fonts every time it's called
+    texts = OrderedDict()  # (text, font name, size, color) -> surface, least recently used first
+    text_hits = 0
+    text_misses = 0
+    # 20x20 tiles packed side by side into one surface, handed out as subsurfaces of it
+    atlas_tiles = ("wall.png", "path.png", "open_door_with_path.png", "closed_door_with_path.png",
+                   "key_with_path.png", "saolin.png", "npc.png")
+    atlas = None
+
+    @classmethod
+    def load(cls, name: str):
+        image = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                               "game_files", "images", name))
+        # converting needs the window, without one (headless) the image stays in the file's format
+        return image.convert_alpha() if pygame.display.get_surface() else image
+
+    @classmethod
+    def build_atlas(cls):
+        tiles = [cls.load(name) for name in cls.atlas_tiles]
+        cls.atlas = pygame.Surface((sum(tile.get_width() for tile in tiles), max(tile.get_height() for tile in tiles)),
+                                   pygame.SRCALPHA)
+        if pygame.display.get_surface():
+            cls.atlas = cls.atlas.convert_alpha()
+        cls.atlas.fill((0, 0, 0, 0))
+        x = 0
+        for name, tile in zip(cls.atlas_tiles, tiles):
+            # adding to the transparent atlas copies the pixels exactly, alpha included
+            cls.atlas.blit(tile, (x, 0), special_flags=pygame.BLEND_RGBA_ADD)
+            cls.images[name] = cls.atlas.subsurface((x, 0, tile.get_width(), tile.get_height()))
+            x += tile.get_width()
+
+    @classmethod
+    def image(cls, name: str):
+        if name not in cls.images:
+            if name in cls.atlas_tiles:
+                cls.build_atlas()
+            else:
+                cls.images[name] = cls.load(name)
+        return cls.images[name]
+
+    @classmethod
+    def font(cls, name: str, size: int):
+        if (name, size) not in cls.fonts:
+            cls.fonts[(name, size)] = pygame.font.SysFont(name, size)
+        return cls.fonts[(name, size)]
+
+    # labels render once, only texts that keep changing (timers, fps) get rendered again
+    @classmethod
+    def text(cls, text: str, name: str, size: int, color: RGB):
+        key = (text, name, size, color)
+        if key in cls.texts:
+            cls.text_hits += 1
+            cls.texts.move_to_end(key)
+            return cls.texts[key]
+        cls.text_misses += 1
+        surface = cls.texts[key] = cls.font(name, size).render(text, True, color)
+        if len(cls.texts) > TEXT_CACHE_SIZE:
+            cls.texts.popitem(last=False)
+        return surface
+
+    @classmethod
+    def sound(cls, name: str):
+        if name not in cls.sounds:
+            cls.sounds[name] = pygame.mixer.Sound(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                               "game_files", "sounds", name))
+        return cls.sounds[name]
+
+
+# parts of the window drawn since the last update, update sends just those to the screen instead of the whole window
+# last frame's parts are sent again too, so whatever moved or got smaller doesn't stay on the screen
+class Display:
+    dirty = []
+    previous = []
+    full = True
+
+    @classmethod
+    def mark(cls, rect: pygame.Rect):
+        cls.dirty.append(rect)
+        return rect
+
+    # the next update sends the whole window, for when a new screen starts
+    @classmethod
+    def mark_all(cls):
+        cls.full = True
+
+    @classmethod
+    def update(cls):
+        if cls.full:
+            pygame.display.flip()
+        else:
+            # every rect once, a crowd of guards marks thousands of them and the same tiles get marked again
+            pygame.display.update(list({tuple(rect): rect for rect in cls.dirty + cls.previous}.values()))
+        cls.previous, cls.dirty = cls.dirty, []
+        cls.full = False
+
+    # for screens that redraw everything every frame
+    @classmethod
+    def flip(cls):
+        pygame.display.flip()
+        cls.previous, cls.dirty = [], []
+        cls.full = False
+
+
+# the black ring (or frame) around the player that hides the rest of the maze, made once for every view distance
+# and shape instead of drawing it every frame
+class Vision:
+    masks = {}  # (view distance, circle, tile size) -> (surface, its position from the player's tile, visible part)
+    strips = {}  # (view distance, circle, tile size, direction) -> (left, top, right, bottom) tiles from the player
+    hidden_color = (255, 0, 255)  # colorkey of the mask, never drawn
+
+    @classmethod
+    def mask(cls, view_distance: int, circle: bool, tile_size: int):
+        key = (view_distance, circle, tile_size)
+        if key not in cls.masks:
+            if circle:
+                thickness = tile_size * 4
+                radius = view_distance * tile_size + 30 + thickness
+                surface = pygame.Surface((radius * 2 + 2, radius * 2 + 2))
+                surface.fill(cls.hidden_color)
+                pygame.draw.circle(surface, COLORS["black"], (radius + 1, radius + 1), radius, thickness + 20)
+                position = (tile_size // 2 - radius - 1, tile_size // 2 - radius - 1)
+            else:
+                side = (view_distance * 2 + 5) * tile_size
+                surface = pygame.Surface((side, side))
+                surface.fill(cls.hidden_color)
+                pygame.draw.rect(surface, COLORS["black"], (0, 0, side, side), tile_size * 2)
+                position = ((-view_distance - 2) * tile_size, (-view_distance - 2) * tile_size)
+            # the see-through part in the middle, the corners outside the ring are see-through too
+            visible = pygame.mask.from_threshold(surface, cls.hidden_color, (1, 1, 1, 255))
+            visible = visible.connected_component((tile_size // 2 - position[0], tile_size // 2 - position[1]))
+            if pygame.display.get_surface():
+                surface = surface.convert()
+            surface.set_colorkey(cls.hidden_color, pygame.RLEACCEL)
+            cls.masks[key] = (surface, position, visible)
+        return cls.masks[key]
+
+    # tiles (from the player's tile) with pixels that come into view during a step in the given direction, the
+    # rest of what's visible during the step already was at its start, so only these need drawing while moving
+    @classmethod
+    def strip(cls, view_distance: int, circle: bool, tile_size: int, direction: tuple):
+        key = (view_distance, circle, tile_size, direction)
+        if key not in cls.strips:
+            _, (mask_x, mask_y), visible = cls.mask(view_distance, circle, tile_size)
+            revealed = pygame.mask.Mask(visible.get_size())
+            for step in range(1, tile_size + 1):
+                revealed.draw(visible, (direction[0] * step, direction[1] * step))
+            revealed.erase(visible, (0, 0))
+            x, y, width, height = revealed.get_bounding_rects()[0].unionall(revealed.get_bounding_rects())
+            cls.strips[key] = ((x + mask_x) // tile_size, (y + mask_y) // tile_size,
+                               -(-(x + width + mask_x) // tile_size), -(-(y + height + mask_y) // tile_size))
+        return cls.strips[key]
 
 
 # class for some other global variables and settings so that funcs dont need global if they need to change some variable
 class Main:
-    pause_image = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                                 "game_files", "images", "pause_button.png"))
     clock = pygame.time.Clock()
-    font = pygame.font.SysFont("arial", 24)
-    # highscores
-    try:
-        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_files", "jsons", "highscores.json"),
-                  "rt", encoding="utf-8") as file:
-            highscores = json.load(file)
-    except FileNotFoundError:
-        highscores = {
-            "endless_all": [{"_id": 10 - i, "place": 10 - i, "name": f"bot{i}", "score": 1000 * i, "seed": 0,
-                             "start": 0, "end": 0, "token": 0} for i in range(9, 0, -1)],
-            "endless_all_custom": [
-                {"_id": 10 - i, "place": 10 - i, "name": f"bot{i}", "score": 5000 + 1000 * i, "seed": 0,
-                 "start": 0, "end": 0, "token": 0} for i in range(9, 0, -1)],
-            "speedrun_easy": [{"_id": i, "place": i, "name": f"bot{i}", "time": 75 + 15 * i, "seed": 0,
-                               "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
-            "speedrun_easy_custom": [{"_id": i, "place": i, "name": f"bot{i}", "time": 60 + 15 * i, "seed": 0,
-                                      "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
-            "speedrun_normal": [{"_id": i, "place": i, "name": f"bot{i}", "time": 400 + 30 * i, "seed": 0,
-                                 "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
-            "speedrun_normal_custom": [{"_id": i, "place": i, "name": f"bot{i}", "time": 300 + 30 * i, "seed": 0,
-                                        "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
-            "speedrun_hard": [{"_id": i, "place": i, "name": f"bot{i}", "time": 900 + 60 * i, "seed": 0,
-                               "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
-            "speedrun_hard_custom": [{"_id": i, "place": i, "name": f"bot{i}", "time": 800 + 60 * i, "seed": 0,
-                                      "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
-            "speedrun_full view": [{"_id": i, "place": i, "name": f"bot{i}", "time": 400 + 30 * i, "seed": 0,
+    # highscores and settings until load_files reads the saved ones
+    highscores = {
+        "endless_all": [{"_id": 10 - i, "place": 10 - i, "name": f"bot{i}", "score": 1000 * i, "seed": 0,
+                         "start": 0, "end": 0, "token": 0} for i in range(9, 0, -1)],
+        "endless_all_custom": [
+            {"_id": 10 - i, "place": 10 - i, "name": f"bot{i}", "score": 5000 + 1000 * i, "seed": 0,
+             "start": 0, "end": 0, "token": 0} for i in range(9, 0, -1)],
+        "speedrun_easy": [{"_id": i, "place": i, "name": f"bot{i}", "time": 75 + 15 * i, "seed": 0,
+                           "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
+        "speedrun_easy_custom": [{"_id": i, "place": i, "name": f"bot{i}", "time": 60 + 15 * i, "seed": 0,
+                                  "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
+        "speedrun_normal": [{"_id": i, "place": i, "name": f"bot{i}", "time": 400 + 30 * i, "seed": 0,
+                             "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
+        "speedrun_normal_custom": [{"_id": i, "place": i, "name": f"bot{i}", "time": 300 + 30 * i, "seed": 0,
                                     "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
-            "speedrun_full view_custom": [{"_id": i, "place": i, "name": f"bot{i}", "time": 300 + 30 * i, "seed": 0,
-                                           "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)]
-        }
-    # settings
-    try:
-        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_files", "jsons", "settings.json"),
-                  "rt", encoding="utf-8") as file:
-            settings = json.load(file)
-    except FileNotFoundError:  # default settings
-        settings = {
-            "difficulty": "Easy",
-            "player speed": "Normal",
-            "sounds": "on",
-            "max fps": 140
-        }
-    diff_to_number = {
-        "Easy": 4,
-        "Normal": 3,
-        "Hard": 2,
-        "Full view": 0
-    }
-    speed_to_length = {
-        "Slow": 200,
-        "Normal": 150,
-        "Fast": 100
+        "speedrun_hard": [{"_id": i, "place": i, "name": f"bot{i}", "time": 900 + 60 * i, "seed": 0,
+                           "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
+        "speedrun_hard_custom": [{"_id": i, "place": i, "name": f"bot{i}", "time": 800 + 60 * i, "seed": 0,
+                                  "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
+        "speedrun_full view": [{"_id": i, "place": i, "name": f"bot{i}", "time": 400 + 30 * i, "seed": 0,
+                                "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)],
+        "speedrun_full view_custom": [{"_id": i, "place": i, "name": f"bot{i}", "time": 300 + 30 * i, "seed": 0,
+                                       "start": 0, "end": 0, "level times": "", "token": 0} for i in range(1, 10)]
     }
-    # loading Qs
-    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_files", "texts", "otazky.txt"), "r",
-              encoding="utf-8") as file_q:
-        questions = [x[:-1].split("=") for x in file_q]
-
-    can_move = {
-        "all": True,
-        "left": True,
-        "right": True,
-        "up": True,
-        "down": True
+    settings = {
+        "difficulty": "Easy",
+        "player speed": "Normal",
+        "sounds": "on",
+        "max fps": 140
     }
+    questions = []  # loaded by choose_q when it runs out
+
     circle_square = True
     switch = True
-    elapsed_movement = 0
-    animation_length = speed_to_length[settings["player speed"]]  # in milliseconds
-    x = 0
-    y = 0
+    recording: Recording  # inputs of the run being played
+    website_opened = False  # by clicking the new version notice
 
     cache = ""
 
@@ -202,28 +324,27 @@ class Main:
 
     @classmethod
     def level_info(cls, maze, update_level_time: bool = True):  # todo redo the time counting
-        fps_text = cls.font.render(f"FPS: {min(round(cls.clock.get_fps()), cls.settings['max fps'])}", True,
-                                   COLORS["white"])
+        fps_text = Assets.text(f"FPS: {min(round(cls.clock.get_fps()), cls.settings['max fps'])}", "arial", 24,
+                               COLORS["white"])
         if update_level_time:
             cls.level_time = pygame.time.get_ticks() / 1000 - cls.level_start
         cls.total_time = pygame.time.get_ticks() / 1000 - cls.total_start
         level_time = datetime.fromtimestamp(cls.level_time)
         total_time = datetime.fromtimestamp(cls.total_time)
-        total_text = cls.font.render(f"TOTAL TIME: {total_time.strftime('%M: %S.')}", True, COLORS["white"])
-        level_text = cls.font.render(f"level time: {level_time.strftime('%M: %S.')}", True, COLORS["white"])
-        score_text = cls.font.render(f"Total Score: {round(cls.score)}", True, COLORS["white"])
-        level_count_text = cls.font.render(f"Level: {cls.current_level} / {cls.total_levels}", True, COLORS["white"])
-        npc_count_text = cls.font.render(f"Guards: {len(Npc.npcs)}", True, COLORS["white"])
-        mode_text = cls.font.render(f"Mode: {cls.mode}", True, COLORS["white"])
-        diff_text = cls.font.render(f"Difficulty: {cls.settings['difficulty']}", True, COLORS["white"])
-        keys_text = cls.font.render(f"Keys: {cls.keys} / {cls.required_keys}    Remaining keys: {len(maze.q_location)}",
-                                    True, COLORS["white"])
-
-        font = pygame.font.SysFont("arial", 18)
-        total_milli = font.render(total_time.strftime("%f")[:-3], True, COLORS["white"])
-        level_milli = font.render(level_time.strftime("%f")[:-3], True, COLORS["white"])
-
-        pygame.draw.rect(WINDOW, COLORS["black"], (0, 0, WIDTH, 60))
+        total_text = Assets.text(f"TOTAL TIME: {total_time.strftime('%M: %S.')}", "arial", 24, COLORS["white"])
+        level_text = Assets.text(f"level time: {level_time.strftime('%M: %S.')}", "arial", 24, COLORS["white"])
+        score_text = Assets.text(f"Total Score: {round(cls.score)}", "arial", 24, COLORS["white"])
+        level_count_text = Assets.text(f"Level: {cls.current_level} / {cls.total_levels}", "arial", 24, COLORS["white"])
+        npc_count_text = Assets.text(f"Guards: {len(Npc.names)}", "arial", 24, COLORS["white"])
+        mode_text = Assets.text(f"Mode: {cls.mode}", "arial", 24, COLORS["white"])
+        diff_text = Assets.text(f"Difficulty: {cls.settings['difficulty']}", "arial", 24, COLORS["white"])
+        keys_text = Assets.text(f"Keys: {Level.keys} / {Level.required_keys}    Remaining keys: {len(maze.q_location)}",
+                                "arial", 24, COLORS["white"])
+
+        total_milli = Assets.text(total_time.strftime("%f")[:-3], "arial", 18, COLORS["white"])
+        level_milli = Assets.text(level_time.strftime("%f")[:-3], "arial", 18, COLORS["white"])
+
+        Display.mark(pygame.draw.rect(WINDOW, COLORS["black"], (0, 0, WIDTH, 60)))
         if cls.mode == "Speedrun":
             WINDOW.blit(level_text, (WIDTH - level_text.get_width() - 10 - 30, 30 // 2 - level_text.get_height() // 2))
             WINDOW.blit(total_text,
@@ -240,23 +361,23 @@ class Main:
         WINDOW.blit(diff_text, (WIDTH * 1 / 4 - diff_text.get_width() // 2, 60 // 2 + 15 - diff_text.get_height() // 2))
         WINDOW.blit(mode_text, (WIDTH * 1 / 4 - mode_text.get_width() // 2, 60 // 2 - 15 - diff_text.get_height() // 2))
         WINDOW.blit(keys_text, (WIDTH // 2 - keys_text.get_width() // 2, 30 // 2 - keys_text.get_height() // 2))
-        for i in range(cls.required_keys):
-            pygame.draw.rect(WINDOW, COLORS["white"], (WIDTH // 2 - 200 // 2 + 200 // cls.required_keys * i,
-                                                       45 - 24 // 2, 200 // cls.required_keys, 24), 2)
+        for i in range(Level.required_keys):
+            pygame.draw.rect(WINDOW, COLORS["white"], (WIDTH // 2 - 200 // 2 + 200 // Level.required_keys * i,
+                                                       45 - 24 // 2, 200 // Level.required_keys, 24), 2)
         WINDOW.blit(maze.key, (WIDTH // 2 - 200 // 2 - 5 - maze.key.get_width(), 35))
         WINDOW.blit(maze.door, (WIDTH // 2 + 200 // 2 + 5, 35))
-        percentage = cls.keys / cls.required_keys
+        percentage = Level.keys / Level.required_keys
         pygame.draw.rect(WINDOW, COLORS["white"] if percentage < 0.5 else COLORS["dark_yellow"] if percentage < 1 else
         COLORS["green"], (WIDTH // 2 - 100, 45 - 24 // 2, 200 * min(percentage, 1), 24))
-        pygame.draw.rect(WINDOW, COLORS["white"], (0, 60, WIDTH, 5))
+        Display.mark(pygame.draw.rect(WINDOW, COLORS["white"], (0, 60, WIDTH, 5)))
         return True
 
     @classmethod
     def win_lose_screen(cls, maze, state: str = "win"):
         if Main.settings["sounds"] == "on" and state == "win":
-            LEVEL_WIN.play()
+            Assets.sound(LEVEL_WIN).play()
         elif Main.settings["sounds"] == "on":
-            LEVEL_LOSE.play()
+            Assets.sound(LEVEL_LOSE).play()
 
         if state == "win":
             victory = Button(WIDTH // 2 - 300 // 2, HEIGHT // 2 - 50 // 2 - 50, 300, 50, COLORS["green"],
@@ -267,6 +388,7 @@ class Main:
 
         continue_button = Button(WIDTH // 2 - 200 // 2, HEIGHT // 2 - 50 // 2 + 50, 200, 50, COLORS["black"],
                                  COLORS["light_grey"], 5, COLORS["white"], "Continue", 24)
+        Display.mark_all()
         while True:
             cls.clock.tick(cls.settings["max fps"])
             for event in pygame.event.get():
@@ -284,10 +406,11 @@ class Main:
                     return
             else:
                 pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-            pygame.display.flip()
+            Display.update()
 
     @classmethod
-    def question(cls, maze):
+    def question(cls, player):
+        maze = player.maze
         question = cls.choose_q()
         header = Button(WIDTH // 2 - 1000 // 2, 200, 1000, 100, COLORS["black"], COLORS["light_grey"], 5,
                         COLORS["black"], question[0], 30)
@@ -295,42 +418,55 @@ class Main:
                           COLORS["white"], question[i + 1], 24) for i in range(3)]
         done = False
         start = pygame.time.get_ticks() / 1000
+        profile = Profiler.loop("question")
+        Display.mark_all()
         while not done:
+            profile.frame()
             cls.clock.tick(cls.settings["max fps"])
+            profile.mark("wait")
             WINDOW.fill(COLORS["black"])
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
+                if event.type == pygame.KEYDOWN:
+                    Profiler.key(event.key)
                 for button in buttons:
                     answer = button.handle_event(event)
                     if answer:
                         done = True
                         break
 
-            font = pygame.font.SysFont("arial", 40)
             time_left = (15 - pygame.time.get_ticks() / 1000 + start)
-            time_left_text = font.render(f"Time left: {str(round(time_left, 1))}", True, COLORS["white"])
+            time_left_text = Assets.text(f"Time left: {str(round(time_left, 1))}", "arial", 40, COLORS["white"])
             if time_left < 0 and not done:
                 answer = next((button.text for button in buttons if button.active), buttons[0].text)
                 if not any((button.text for button in buttons if button.active)):
                     buttons[0].active = True
                 done = True
 
-            WINDOW.blit(time_left_text, (WIDTH // 2 - time_left_text.get_width() // 2, 100))
+            profile.mark("events")
+
+            Display.mark(WINDOW.blit(time_left_text, (WIDTH // 2 - time_left_text.get_width() // 2, 100)))
             header.draw(WINDOW)
             for button in buttons:
                 button.draw(WINDOW)
+            profile.mark("buttons")
             cls.level_info(maze)
-            pygame.display.flip()
-
-        if answer == question[-1]:
-            cls.keys += 1
-            if Main.settings["sounds"] == "on":
-                CORRECT_QUESTION.play()
+            profile.mark("hud")
+            if overlay := profile.draw(WINDOW, Assets.font("consolas", 16)):
+                Display.mark(overlay)
+                profile.mark("profiler")
+            Display.update()
+            profile.mark("display")
+
+        Level.take_key(player, answer == question[-1])
+        cls.recording.answer(answer == question[-1])
+        if answer == question[-1] and Main.settings["sounds"] == "on":
+            Assets.sound(CORRECT_QUESTION).play()
         elif Main.settings["sounds"] == "on":
-            WRONG_QUESTION.play()
+            Assets.sound(WRONG_QUESTION).play()
 
         for button in buttons:
             if button.text == str(question[-1]):
@@ -339,7 +475,7 @@ class Main:
                 button.bg_color = COLORS["red"]
             button.active = False
             button.draw(WINDOW)
-            pygame.display.flip()
+            Display.update()
 
         cont = Button(WIDTH // 2 - 150 // 2, 600, 150, 50, COLORS["black"], COLORS["light_grey"], 5, COLORS["white"],
                       text="CONTINUE", font_color=COLORS["white"], font_hover_color=COLORS["black"], fontsize=30)
@@ -359,7 +495,7 @@ class Main:
                     break
             else:
                 pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-            pygame.display.flip()
+            Display.update()
 
     # chooses a random questions and shuffles answers
     @classmethod
@@ -385,91 +521,75 @@ class Main:
         pause_button = Button(10, 10, 40, 40, COLORS["white"], COLORS["light_grey"], 1, COLORS["white"])
         cls.level_start = pygame.time.get_ticks() / 1000
         cls.switch = True
-        cls.required_keys = len(maze.q_location) // 2
-        cls.keys = 0
-        Main.can_move["all"] = True  # hopefully fixed the bug when sometimes you can die and next run you cant move
-
-        player = Player(maze)
-        pygame.time.set_timer(NPC_UPDATE_POS, 9000)
-        pygame.time.set_timer(NPC_MOVE, 2000)
-        Npc.update_player_coordinates(player)
+        player = Level.start_level(Player(maze))
+        cls.recording.start_level()
 
         WINDOW.fill(COLORS["black"])
         player.maze.render_full(player)
         player.render(0, 0)
+        profile = Level.profile
         done = False
         while not done:
+            profile.frame()
             ms = cls.clock.tick(cls.settings["max fps"])
+            profile.mark("wait")
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
+                # the overlay leaves its picture behind when it goes
+                elif event.type == pygame.KEYDOWN and Profiler.key(event.key):
+                    WINDOW.fill(COLORS["black"])
+                    player.maze.render_full(player)
+                    player.render(0, 0)
 
-                if event.type == NPC_UPDATE_POS:
-                    Npc.update_player_coordinates(player)
-                if event.type == NPC_MOVE:
-                    Npc.move_all_npc(player)
-                if event.type == NPC_RENDER:
-                    if Npc.elapsed_movement < Main.animation_length:
-                        Npc.elapsed_movement = min(Npc.elapsed_movement + ms, Main.animation_length)
-                        pygame.event.post(pygame.event.Event(NPC_RENDER))
-                    else:
-                        Npc.can_kill = True
-                    Npc.render_all_npc(player)
-                    if not Main.elapsed_movement:
-                        player.render(0, 0)
-
-                if event.type == MOVE:
-                    if Main.elapsed_movement < Main.animation_length:
-                        Main.can_move["all"] = False
-                        Main.elapsed_movement = min(Main.elapsed_movement + ms, Main.animation_length)
-                        offset_x = int(Main.elapsed_movement / Main.animation_length * player.maze.tile_size) * Main.x
-                        offset_y = int(Main.elapsed_movement / Main.animation_length * player.maze.tile_size) * Main.y
-                        player.maze.render_movement(player)
-                        player.render(offset_x, offset_y)
-                        pygame.event.post(pygame.event.Event(MOVE))
-                    else:
-                        Main.can_move["all"] = True
-                        player.x += Main.x
-                        player.y += Main.y
-                        Main.x = Main.y = 0
-                        player.maze.render_movement(player)
-                        player.render(0, 0)
-                        cls.elapsed_movement = 0
-
-            # win
-            if player.maze.is_tile(player.x, player.y, "F") and cls.keys / cls.required_keys >= 1:
-                cls.win_lose_screen(maze)
-                exitcode = "win"
-                break
-
-            # lose
-            if name := Npc.collide(player) and Npc.can_kill:
-                cls.win_lose_screen(maze, name)
-                exitcode = "lose"
-                break
-
-            # also lose
-            if cls.keys + len(maze.q_location) < cls.required_keys:
-                cls.win_lose_screen(maze, "Q")
-                exitcode = "lose"
-                break
-
-            if (player.x, player.y) in maze.q_location:
-                cls.question(maze)
-                maze.change_tile(player.x, player.y, "p")
-                maze.q_location.remove((player.x, player.y))
-                if cls.keys >= cls.required_keys:
-                    player.maze.door = player.maze.open_door
+            keys_pressed = pygame.key.get_pressed()
+            inputs = read_inputs(keys_pressed)
+            if Level.animation_length != cls.recording.current_length:
+                cls.recording.speed(Level.scheduler.time // TICK_LENGTH, Level.animation_length)
+            profile.mark("events")
+            state = None
+            for _ in range(Level.scheduler.advance(ms)):
+                # keys only matter on ticks where a step can start
+                if Level.can_move["all"] and inputs != cls.recording.inputs:
+                    cls.recording.press(Level.scheduler.time // TICK_LENGTH, inputs)
+                if state := Level.level_tick(player, keys_pressed):
+                    break
+            if Npc.ring:
+                Npc.ring = False
+                if cls.settings["sounds"] == "on":
+                    Assets.sound(ALARM_SOUND).play()
+            profile.mark("ticks")
+
+            if state == "question":
+                cls.question(player)
                 WINDOW.fill(COLORS["black"])
                 player.maze.render_full(player)
                 player.render(0, 0)
+                profile.mark("question")
+            elif state:
+                cls.win_lose_screen(maze, state)
+                exitcode = "win" if state == "win" else "lose"
+                break
 
-            keys_pressed = pygame.key.get_pressed()
-            if Main.can_move["all"]:
-                player.movement(keys_pressed)
-
+            # things are drawn as far along as they'd be lag ms after the last tick
+            if Level.x or Level.y:
+                offset = int(min(Level.elapsed_movement + Level.scheduler.lag, Level.animation_length)
+                             / Level.animation_length * player.maze.tile_size)
+                player.maze.render_movement(player)
+                profile.mark("guards")
+                player.render(offset * Level.x, offset * Level.y)
+            elif Level.redraw:
+                player.maze.render_movement(player)
+                profile.mark("guards")
+                player.render(0, 0)
+            elif Npc.moved or not Npc.can_kill:
+                player.maze.render_guards(player)
+                profile.mark("guards")
+                player.render(0, 0)
+            Level.redraw = Npc.moved = False
+            profile.mark("player")
 
             #cheat option
             if keys_pressed[pygame.K_x]:
@@ -478,6 +598,7 @@ class Main:
                 break
 
             cls.level_info(maze)
+            profile.mark("hud")
             pause_button.draw(WINDOW)
             if pause_button.is_over(WINDOW, pygame.mouse.get_pos()) or keys_pressed[pygame.K_ESCAPE]:
                 if pygame.mouse.get_pressed()[0] or keys_pressed[pygame.K_ESCAPE]:
@@ -498,9 +619,15 @@ class Main:
                             break
             else:
                 pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-            WINDOW.blit(cls.pause_image, (10, 10))
-            pygame.display.flip()
-
+            Display.mark(WINDOW.blit(Assets.image("pause_button.png"), (10, 10)))
+            profile.mark("pause")
+            if overlay := profile.draw(WINDOW, Assets.font("consolas", 16)):
+                Display.mark(overlay)
+                profile.mark("profiler")
+            Display.update()
+            profile.mark("display")
+
+        cls.recording.end_level(Level.scheduler.time // TICK_LENGTH)
         return exitcode
 
     @classmethod
@@ -529,24 +656,18 @@ class Main:
                 cls.current_level = 1
                 cls.total_levels = 5
                 cls.each_level_times = []
-                width = 91 - Main.diff_to_number[Main.settings["difficulty"]] * 20
-                height = 47 - Main.diff_to_number[Main.settings["difficulty"]] * 10
-                if cls.settings["difficulty"] == "Full view":
-                    width, height = 15, 9
-                maze = Maze(width, height, rng)
+                cls.recording = Recording(Level.animation_length)
                 cls.mode_start = datetime.now()
                 cls.total_start = pygame.time.get_ticks() / 1000
 
-                for _ in range(5):
+                for width, height in Level.speedrun_sizes(cls.settings["difficulty"]):
+                    maze = Maze(width, height, rng)
                     state = cls.level(maze)
                     if state == "lose":
                         win_lose = state
                         break
                     cls.each_level_times.append(str(round(cls.level_time, 3)))
-                    width += 4 if cls.settings["difficulty"] != "Full view" else 12
-                    height += 2 if cls.settings["difficulty"] != "Full view" else 6
                     cls.current_level += 1
-                    maze = Maze(width, height, rng)
 
                 cls.mode_end = datetime.now()
                 enter_name = False
@@ -571,6 +692,7 @@ class Main:
                 exit_button = Button(WIDTH // 2 - 200 // 2, 500, 200, 50, COLORS["black"], COLORS["light_grey"], 5,
                                      COLORS["white"], "Continue", 24)
 
+                Display.mark_all()
                 while True:
                     cls.clock.tick(cls.settings["max fps"])
                     for event in pygame.event.get():
@@ -592,14 +714,15 @@ class Main:
                             break
                     else:
                         pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-                    pygame.display.flip()
+                    Display.update()
 
                 if enter_name:
-                    highscores[-1] = {"_id": 9, "place": 9, "name": name.text, "time": cls.total_time,
-                                      "level times": str(cls.each_level_times), "seed": cls.seed_value,
-                                      "seed_type": cls.seed,
-                                      "start": cls.mode_start.strftime("%Y/%m/%d %H:%M:%S"),
-                                      "end": cls.mode_end.strftime("%Y/%m/%d %H:%M:%S"), "token": cls.make_token()}
+                    entry = {"_id": 9, "place": 9, "name": name.text, "time": cls.total_time,
+                             "level times": str(cls.each_level_times), "seed": cls.seed_value, "seed_type": cls.seed,
+                             "start": cls.mode_start.strftime("%Y/%m/%d %H:%M:%S"),
+                             "end": cls.mode_end.strftime("%Y/%m/%d %H:%M:%S"), "token": cls.make_token(),
+                             "replay": cls.recording.encode()}
+                    highscores[-1] = entry
                     highscores.sort(key=lambda item: item["time"])
                     highscores = highscores[:9]
                     for x in range(len(highscores)):
@@ -608,7 +731,7 @@ class Main:
                     Main.highscores[f"speedrun_{cls.settings['difficulty'].lower()}"
                                     + f"{'' if cls.seed == 'random' else '_custom'}"] = copy.deepcopy(highscores)
                     cls.save_highscores()
-                    Database.active.sync_online("speedrun")
+                    Database.sync_online("speedrun")
 
             elif selection == "Settings":
                 cls.settings_gui()
@@ -636,6 +759,7 @@ class Main:
                 width = 11
                 height = 7
                 maze = Maze(width, height, rng)
+                cls.recording = Recording(Level.animation_length)
                 cls.mode_start = datetime.now()
                 cls.total_start = pygame.time.get_ticks() / 1000
                 cls.score = 0
@@ -645,7 +769,7 @@ class Main:
                         win_lose = state
                         break
                     cls.score += (width * height - cls.level_time) * (1
-                        +(5 - (cls.diff_to_number[cls.settings["difficulty"]]
+                        +(5 - (Level.diff_to_number[cls.settings["difficulty"]]
                               or 5)))
                     width = min(width + 4, MAX_MAZE_WIDTH)
                     height = min(height + 2, MAX_MAZE_HEIGHT)
@@ -673,6 +797,7 @@ class Main:
                 exit_button = Button(WIDTH // 2 - 200 // 2, 500, 200, 50, COLORS["black"], COLORS["light_grey"], 5,
                                      COLORS["white"], "Continue", 24)
 
+                Display.mark_all()
                 while True:
                     cls.clock.tick(cls.settings["max fps"])
                     for event in pygame.event.get():
@@ -694,7 +819,7 @@ class Main:
                             break
                     else:
                         pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-                    pygame.display.flip()
+                    Display.update()
 
                 if enter_name:
                     highscores[-1] = {"_id": 9, "place": 9, "name": name.text, "score": cls.score,
@@ -708,7 +833,7 @@ class Main:
                         highscores[x]["place"] = x + 1
                     Main.highscores[f"endless_all{'' if cls.seed == 'random' else '_custom'}"] = copy.deepcopy(highscores)
                     cls.save_highscores()
-                    Database.active.sync_online("endless")
+                    Database.sync_online("endless")
             elif selection == "Settings":
                 cls.settings_gui()
             else:
@@ -796,7 +921,7 @@ class Main:
                     }
                     if Main.settings["max fps"] == "unlimited":
                         Main.settings["max fps"] = 1000
-                    cls.animation_length = cls.speed_to_length[cls.settings["player speed"]]
+                    Level.animation_length = Level.speed_to_length[cls.settings["player speed"]]
                     cls.save_settings()
                     pygame.time.delay(200)
                     break
@@ -805,7 +930,18 @@ class Main:
 
             for each in points:
                 pygame.draw.polygon(WINDOW, COLORS["white"], each)
-            pygame.display.flip()
+            Display.flip()
+
+    @classmethod
+    def load_files(cls):
+        for name in ("highscores", "settings"):
+            try:
+                with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_files", "jsons",
+                                       f"{name}.json"), "rt", encoding="utf-8") as file:
+                    setattr(cls, name, json.load(file))
+            except FileNotFoundError:
+                pass
+        Level.animation_length = Level.speed_to_length[cls.settings["player speed"]]
 
     @classmethod
     def save_settings(cls):
@@ -819,347 +955,199 @@ class Main:
                   "wt", encoding="utf-8") as file:
             json.dump(Main.highscores, file, indent=2)
 
+    # online status under the main menu, the game plays offline until the database connects
+    @classmethod
+    def connection_status(cls, none: None):
+        if CONNECTED and Database.version != VERSION:
+            text = f"Online, version {Database.version} is out, click here to get it"
+        elif CONNECTED:
+            text = "Online"
+        else:
+            text = "Connecting..." if not Network.connection.done() else "Offline"
+        status = Assets.text(text, "arial", 18, COLORS["light_grey"])
+        rect = Display.mark(WINDOW.blit(status, (10, HEIGHT - status.get_height() - 10)))
+        if CONNECTED and Database.version != VERSION and rect.collidepoint(pygame.mouse.get_pos()) \
+                and pygame.mouse.get_pressed()[0] and not cls.website_opened:
+            cls.website_opened = True
+            webbrowser.open_new_tab("https://czmatejt9.github.io")
+        return True
+
 
-class Maze:
-    def __init__(self, width: int, height: int, rng: random.Random, top_indent: int = 65):
-        if width < 5 or height < 5:
-            raise ValueError("Width and height must be 5 or bigger")
-        self.width = width
-        self.height = height
-        self.rng = rng
+class Maze(maze_core.Maze):
+    def __init__(self, width: int, height: int, rng: random.Random, top_indent: int = 65,
+                 fast_generation: bool = False, guard_count: int = None):
+        self.layer = None  # every tile drawn once, see get_layer
+        super().__init__(width, height, rng, fast_generation, guard_count)
         self.top_indent = top_indent
-        self.maze = self.maze_generator()
-        self.start, self.end = self.add_start_finish()
-        self.q_location = self.add_questions()
-        self.wall = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                                   "game_files", "images", "wall.png"))
-        self.path = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                                   "game_files", "images", "path.png"))
-        self.open_door = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                                        "game_files", "images", "open_door_with_path.png"))
-        self.closed_door = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                                          "game_files", "images", "closed_door_with_path.png"))
+        self.wall = Assets.image("wall.png")
+        self.path = Assets.image("path.png")
+        self.open_door = Assets.image("open_door_with_path.png")
+        self.closed_door = Assets.image("closed_door_with_path.png")
         self.door = self.closed_door
-        self.key = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                                  "game_files", "images", "key_with_path.png"))
+        self.key = Assets.image("key_with_path.png")
+        self.guard = Assets.image("npc.png")
         self.tile_size = 20
-        Npc.clear()
-        for _ in range(min((self.width * self.height + 100) // 600, 3)):
-            Npc(self, self.rng)
-
-    def maze_generator(self):
-        generated_maze = [list("w" * self.width) for _ in range(self.height)]  # creating a wall grid
-
-        # selecting a starting wall
-        x = self.rng.randrange(1, self.width - 1, 2)
-        y = self.rng.randrange(1, self.height - 1, 2)  # border compensation
-
-        walls = []
-        self.add_walls(generated_maze, x, y, walls)
-        while walls:
-            # deleting improper walls
-            temp = [each for each in walls if generated_maze[each[1]][each[0]] != "p"
-                    and 1 <= each[0] <= self.width - 2 and 1 <= each[1] <= self.height - 2]
-            walls = temp
-
-            # returning the maze if walls are empty
-            if not walls:
-                break
-
-            # processing random wall
-            x, y = self.rng.choice(walls)
-            self.make_passages(generated_maze, x, y, walls)
-            walls.remove((x, y))
-
-        return generated_maze
-
-    # sub function for maze_generator_sub to make passages and walls while generating maze
-    def make_passages(self, generated_maze: list, x: int, y: int, walls: list):
-        # counting passages around wall
-        n_up = n_down = n_left = n_right = 0
-        if generated_maze[y][x + 1] == "c":
-            n_right += 1
-        if generated_maze[y + 1][x] == "c":
-            n_down += 1
-        if generated_maze[y][x - 1] == "c":
-            n_left += 1
-        if generated_maze[y - 1][x] == "c":
-            n_up += 1
-
-        # if there's only one passage around wall
-        if n_down + n_up + n_left + n_right == 1:
-            generated_maze[y][x] = "p"
-            if n_right == 1:
-                self.add_walls(generated_maze, x - 1, y, walls)
-            elif n_left == 1:
-                self.add_walls(generated_maze, x + 1, y, walls)
-            elif n_down == 1:
-                self.add_walls(generated_maze, x, y - 1, walls)
-            else:
-                self.add_walls(generated_maze, x, y + 1, walls)
-
-    # sub function that adds walls around processed wall while generating maze
-    def add_walls(self, generated_maze: list, x: int, y: int, walls: list):
-        if 0 < x < self.width - 1 and 0 < y < self.height - 1:
-            generated_maze[y][x] = "c"
-            walls.extend(((x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)))
-        return None
-
-    def is_tile(self, x, y, tile):
-        return self.maze[y][x] == tile
-
-    def change_tile(self, x, y, tile):
-        self.maze[y][x] = tile
 
     def get_tile(self, x, y):
-        if self.maze[y][x] == "w":
-            return self.path
-        elif self.maze[y][x] == "F":
+        tile = self.maze.tiles[y * self.width + x]
+        if tile == FINISH_CODE:
             return self.door
-        elif self.maze[y][x] == "Q":
+        elif tile == KEY_CODE:
             return self.key
         else:
             return self.path
 
-    def add_start_finish(self):
-        x = 1
-        y = self.rng.randint(1, self.height - 2)
-        while self.is_tile(x, y, "w"):
-            y = self.rng.randint(1, self.height - 2)
-        self.change_tile(x, y, "S")
-        start = (x, y)
-
-        x = self.width - 2
-        y = self.rng.randint(1, self.height - 2)
-        while self.is_tile(x, y, "w"):
-            y = self.rng.randint(1, self.height - 2)
-        self.change_tile(x, y, "F")
-        end = (x, y)
-        return start, end
-
-    def add_questions(self):
-        location = set()
-        amount = max(self.height * self.width // 100 + 1, 2)
-        for _ in range(amount):
-            x = self.rng.randint(1, self.width - 2)
-            y = self.rng.randint(1, self.height - 2)
-            while self.maze[y][x] not in ("c", "p") or (x + 1, y) in location \
-                    or (x - 1, y) in location or (x, y + 1) in location or (x, y - 1) in location:
-                x = self.rng.randint(1, self.width - 2)
-                y = self.rng.randint(1, self.height - 2)
-            self.maze[y][x] = "Q"
-            location.add((x, y))
-        return location
+    def change_tile(self, x, y, tile):
+        super().change_tile(x, y, tile)
+        if self.layer is not None:
+            self.draw_layer_tile(x, y)
+
+    def open_exit(self):
+        super().open_exit()
+        self.door = self.open_door
+        if self.layer is not None:
+            self.draw_layer_tile(*self.end)
+
+    # the whole maze pre-rendered, built on first use and then only patched by change_tile and open_exit
+    def get_layer(self):
+        if self.layer is None:
+            size = (self.width * self.tile_size, self.height * self.tile_size)
+            # same pixel format as the window, so blitting the layer is a plain copy
+            window = pygame.display.get_surface()
+            self.layer = pygame.Surface(size, 0, window) if window else pygame.Surface(size)
+            images = {WALL_CODE: self.wall, KEY_CODE: self.key, FINISH_CODE: self.door}
+            tiles = self.maze.tiles
+            self.layer.blits([(images.get(tiles[y * self.width + x], self.path),
+                               (x * self.tile_size, y * self.tile_size))
+                              for y in range(self.height) for x in range(self.width)
+                              if tiles[y * self.width + x] != ord("x")], False)
+        return self.layer
+
+    def draw_layer_tile(self, x, y):
+        tile = self.maze.tiles[y * self.width + x]
+        if tile == WALL_CODE:
+            image = self.wall
+        elif tile == KEY_CODE:
+            image = self.key
+        elif tile == FINISH_CODE:
+            image = self.door
+        elif tile == ord("x"):
+            self.layer.fill(COLORS["black"], (x * self.tile_size, y * self.tile_size, self.tile_size, self.tile_size))
+            return None
+        else:
+            image = self.path
+        self.layer.blit(image, (x * self.tile_size, y * self.tile_size))
 
     def render_full(self, player):
         x, y = (WIDTH // 2 - self.width * self.tile_size // 2,
                 (HEIGHT + self.top_indent) // 2 - self.height * self.tile_size // 2)
         pygame.draw.rect(WINDOW, COLORS["white"],
                          (x - 2, y - 2, self.width * self.tile_size + 4, self.height * self.tile_size + 4), 2)
-        xx = x
-        for i, row in enumerate(self.maze):
-            x = xx
-            for j, tile in enumerate(row):
-                # background tiles
-                if abs(i - player.y) > player.view_distance or abs(j - player.x) > player.view_distance:
-                    pygame.draw.rect(WINDOW, COLORS["black"], (x, y, 20, 20))
-                elif tile == "w":
-                    WINDOW.blit(self.wall, (x, y))
-                elif tile == "Q":
-                    WINDOW.blit(self.key, (x, y))
-                elif tile == "F":
-                    WINDOW.blit(self.door, (x, y))
-                elif tile == "x":
-                    pygame.draw.rect(WINDOW, COLORS["black"], (x, y, 10, 10))
-                else:
-                    WINDOW.blit(self.path, (x, y))
-                x += self.tile_size
-            y += self.tile_size
-        Npc.render_all_npc(player)
+        WINDOW.blit(self.get_layer(), (x, y))
+        Display.mark_all()
+
+        # fog over every tile further than view distance from the player in either direction
+        size = self.tile_size
+        left, right = max(player.x - player.view_distance, 0), min(player.x + player.view_distance + 1, self.width)
+        top, bottom = max(player.y - player.view_distance, 0), min(player.y + player.view_distance + 1, self.height)
+        for rect in ((x, y, self.width * size, top * size),
+                     (x, y + bottom * size, self.width * size, (self.height - bottom) * size),
+                     (x, y + top * size, left * size, (bottom - top) * size),
+                     (x + right * size, y + top * size, (self.width - right) * size, (bottom - top) * size)):
+            if rect[2] > 0 and rect[3] > 0:
+                pygame.draw.rect(WINDOW, COLORS["black"], rect)
+        self.render_guards(player)
 
     def render_movement(self, player):
-        if player.view_distance < 100:
+        if player.view_distance < 100 and (Level.x or Level.y):
+            # mid step, everything visible at the start of it is still on the screen
             x, y = (WIDTH // 2 - self.width * self.tile_size // 2,
                     (HEIGHT + self.top_indent) // 2 - self.height * self.tile_size // 2)
-            for xx in range(max(player.x - player.view_distance - 1, 0),
-                            min(player.x + player.view_distance + 2, self.width)):
-                for yy in range(max(player.y - player.view_distance - 1, 0),
-                                min(player.y + player.view_distance + 2, self.height)):
-                    if self.maze[yy][xx] == "w":
-                        WINDOW.blit(self.wall, (x + xx * self.tile_size, y + yy * self.tile_size))
-                    elif self.maze[yy][xx] == "Q":
-                        WINDOW.blit(self.key, (x + xx * self.tile_size, y + yy * self.tile_size))
-                    elif self.maze[yy][xx] == "F":
-                        WINDOW.blit(self.door, (x + xx * self.tile_size, y + yy * self.tile_size))
-                    else:
-                        WINDOW.blit(self.path, (x + xx * self.tile_size, y + yy * self.tile_size))
-        Npc.render_all_npc(player)
-        # moved circle for vision to player render
-
-    # TODO magnetic moving
-    def get_surrounding_walls(self, x, y):
-        count = 0
-        if self.is_tile(x + 1, y, "w"):
-            count += 1
-        if self.is_tile(x - 1, y, "w"):
-            count += 1
-        if self.is_tile(x, y + 1, "w"):
-            count += 1
-        if self.is_tile(x, y - 1, "w"):
-            count += 1
-
-        return count
-
-
-class Player:
+            size = self.tile_size
+            left, top, right, bottom = Vision.strip(player.view_distance, Main.circle_square, size, (Level.x, Level.y))
+            left, right = max(player.x + left, 0), min(player.x + right, self.width)
+            top, bottom = max(player.y + top, 0), min(player.y + bottom, self.height)
+            if left < right and top < bottom:
+                Display.mark(WINDOW.blit(self.get_layer(), (x + left * size, y + top * size),
+                                         (left * size, top * size, (right - left) * size, (bottom - top) * size)))
+        elif player.view_distance < 100:
+            x, y = (WIDTH // 2 - self.width * self.tile_size // 2,
+                    (HEIGHT + self.top_indent) // 2 - self.height * self.tile_size // 2)
+            size = self.tile_size
+            left = max(player.x - player.view_distance - 1, 0)
+            right = min(player.x + player.view_distance + 2, self.width)
+            top = max(player.y - player.view_distance - 1, 0)
+            bottom = min(player.y + player.view_distance + 2, self.height)
+            Display.mark(WINDOW.blit(self.get_layer(), (x + left * size, y + top * size),
+                                     (left * size, top * size, (right - left) * size, (bottom - top) * size)))
+        Level.profile.mark("maze")
+        self.render_guards(player)
+
+    # only the tiles around the player are looked at, every guard and step is drawn once however many share it
+    def render_guards(self, player):
+        if Npc.maze is not self or not Npc.names:
+            return None
+        width, size = self.width, self.tile_size
+        reach = player.view_distance + 1
+        left, right = max(player.x - reach, 0), min(player.x + reach + 1, width)
+        top, bottom = max(player.y - reach, 0), min(player.y + reach + 1, self.height)
+        first, next_guard, old_xs, old_ys = Npc.first, Npc.next, Npc.old_xs, Npc.old_ys
+        steps = set()
+        for y in range(top, bottom):
+            row = first[y * width + left:y * width + right]
+            if row.count(-1) == len(row):
+                continue
+            for x, guard in enumerate(row, left):
+                while guard != -1:
+                    steps.add((old_xs[guard], old_ys[guard], x, y))
+                    guard = next_guard[guard]
+        if not steps:
+            return None
+
+        origin_x, origin_y = (WIDTH // 2 - self.width * size // 2,
+                              (HEIGHT + self.top_indent) // 2 - self.height * size // 2)
+        progress = min(Npc.elapsed_movement + Level.scheduler.lag, Level.animation_length) / Level.animation_length
+        # tiles under every step first, so no guard gets drawn over by the tile another one left
+        for old_x, old_y, x, y in steps:
+            Display.mark(WINDOW.blit(self.get_tile(old_x, old_y), (origin_x + old_x * size, origin_y + old_y * size)))
+            Display.mark(WINDOW.blit(self.get_tile(x, y), (origin_x + x * size, origin_y + y * size)))
+        for old_x, old_y, x, y in steps:
+            Display.mark(WINDOW.blit(self.guard, (origin_x + old_x * size + progress * (x - old_x) * size,
+                                                 origin_y + old_y * size + progress * (y - old_y) * size)))
+        return None
+
+
+class Player(level.Player):
     def __init__(self, maze: Maze):
-        self.x, self.y = maze.start
+        super().__init__(maze)
         self.view_distance = 101
-        if x := Main.diff_to_number[Main.settings["difficulty"]]:
+        if x := Level.diff_to_number[Main.settings["difficulty"]]:
             self.view_distance = x
-        self.score = 0
-        self.maze = maze
-        self.image = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                                    "game_files", "images", "saolin.png"))
-        self.render(0, 0)
-
-    def movement(self, keys_pressed):
-        if (keys_pressed[pygame.K_a] or keys_pressed[pygame.K_LEFT]) and not self.maze.is_tile(self.x - 1, self.y, "w"):
-            pygame.event.post(pygame.event.Event(MOVE))
-            Main.x -= 1
-        elif (keys_pressed[pygame.K_d] or keys_pressed[pygame.K_RIGHT]) and not self.maze.is_tile(self.x + 1, self.y,
-                                                                                                  "w"):
-            pygame.event.post(pygame.event.Event(MOVE))
-            Main.x += 1
-        elif (keys_pressed[pygame.K_w] or keys_pressed[pygame.K_UP]) and not self.maze.is_tile(self.x, self.y - 1, "w"):
-            pygame.event.post(pygame.event.Event(MOVE))
-            Main.y -= 1
-        elif (keys_pressed[pygame.K_s] or keys_pressed[pygame.K_DOWN]) and not self.maze.is_tile(self.x, self.y + 1,
-                                                                                                 "w"):
-            pygame.event.post(pygame.event.Event(MOVE))
-            Main.y += 1
-
-        Main.elapsed_movement = 0
+        self.image = Assets.image("saolin.png")
 
     def render(self, offset_x, offset_y):
         x, y = (WIDTH // 2 - self.maze.width * self.maze.tile_size // 2,
                 (HEIGHT + self.maze.top_indent) // 2 - self.maze.height * self.maze.tile_size // 2)
         x += self.x * self.maze.tile_size + offset_x
         y += self.y * self.maze.tile_size + offset_y
-        WINDOW.blit(self.maze.get_tile(self.x, self.y), (x - offset_x, y - offset_y))
-        WINDOW.blit(self.maze.get_tile(self.x + Main.x, self.y + Main.y),
-                    (x - offset_x + Main.x * 20, y - offset_y + Main.y * 20))
-        WINDOW.blit(self.image, (x, y))
+        Display.mark(WINDOW.blit(self.maze.get_tile(self.x, self.y), (x - offset_x, y - offset_y)))
+        Display.mark(WINDOW.blit(self.maze.get_tile(self.x + Level.x, self.y + Level.y),
+                                 (x - offset_x + Level.x * 20, y - offset_y + Level.y * 20)))
+        Display.mark(WINDOW.blit(self.image, (x, y)))
 
-        # circle for vision
+        # vision
         if self.view_distance > 100:
             return None
         x, y = (WIDTH // 2 - self.maze.width * self.maze.tile_size // 2,
                 (HEIGHT + self.maze.top_indent) // 2 - self.maze.height * self.maze.tile_size // 2)
-        if Main.circle_square:
-            circle_thickness = self.maze.tile_size * 4
-            pygame.draw.circle(WINDOW, COLORS["black"], (x + self.x * self.maze.tile_size + 10 + offset_x,
-                                                         y + self.y * self.maze.tile_size + 10 + offset_y),
-                               self.view_distance * self.maze.tile_size + 30 + circle_thickness, circle_thickness + 20)
-        else:
-            # SQUARE RENDERING, order is: up, down, left, right
-            pygame.draw.rect(WINDOW, COLORS["black"],
-                             (x + (self.x - self.view_distance - 2) * self.maze.tile_size + offset_x,
-                              y + (self.y - self.view_distance - 2) * self.maze.tile_size + offset_y,
-                              (self.view_distance * 2 + 5) * self.maze.tile_size,
-                              self.maze.tile_size * (self.view_distance * 2 + 5)), self.maze.tile_size * 2)
-        # border
+        mask, (mask_x, mask_y), _ = Vision.mask(self.view_distance, Main.circle_square, self.maze.tile_size)
+        Display.mark(WINDOW.blit(mask, (x + self.x * self.maze.tile_size + mask_x + offset_x,
+                                        y + self.y * self.maze.tile_size + mask_y + offset_y)))
+        # border, only the parts the vision just drew over changed and those are already marked
         pygame.draw.rect(WINDOW, COLORS["white"], (x - 2, y - 2, self.maze.width * self.maze.tile_size + 4,
                                                    self.maze.height * self.maze.tile_size + 4), 2)
 
 
-# class defining non player characters
-class Npc:
-    image = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                           "game_files", "images", "npc.png"))
-    player_coordinates = (0, 0)
-    elapsed_movement = 0
-    can_kill = True
-    moved = False
-    npcs = []
-    names = ["Base", "Petr", "Alfons"]
-
-    def __init__(self, maze: Maze, rng: random.Random, view_distance: int = 20):
-        self.maze = maze
-        self.name = rng.choice(self.names)
-        self.npcs.append(self)
-        self.view_distance = view_distance
-        self.y = rng.randint(1, self.maze.height - 2)
-        self.x = rng.randint(self.maze.width // 2, self.maze.width - 2)
-        self.old_x, self.old_y = self.x, self.y
-        while self.maze.maze[self.y][self.x] == "w":
-            self.y = rng.randint(1, self.maze.height - 2)
-            self.x = rng.randint(self.maze.width // 2, self.maze.width - 2)
-
-    # moves npc closer to the player, player_x and player_y is for determining the path (NPCs vision is delayed)
-    # whereas player contains actual position and is used for rendering purposes
-    def npc_move(self, player: Player):
-        player_x, player_y = self.player_coordinates
-        self.old_y, self.old_x = self.y, self.x
-        if abs(self.x - player_x) > self.view_distance or abs(self.y - player_y) > self.view_distance:
-            return None
-
-        path = path_finder(self.maze, (self.y, self.x), (player_y, player_x), "w")
-        try:
-            self.y, self.x = path[1]
-        except IndexError:
-            self.y, self.x = path[0]
-            self.old_y, self.old_x = self.y, self.x
-
-        if Main.settings["sounds"] == 'on' and len(path) <= 30:
-            ALARM_SOUND.play()
-        return None
-
-    def render(self, player: Player):
-        if abs(self.y - player.y) > player.view_distance + 1 or abs(self.x - player.x) > player.view_distance + 1:
-            return None
-        x, y = (WIDTH // 2 - self.maze.width * self.maze.tile_size // 2,
-                (HEIGHT + self.maze.top_indent) // 2 - self.maze.height * self.maze.tile_size // 2)
-        x += self.old_x * self.maze.tile_size
-        y += self.old_y * self.maze.tile_size
-        WINDOW.blit(self.maze.get_tile(self.old_x, self.old_y), (x, y))
-        WINDOW.blit(self.maze.get_tile(self.x, self.y),
-                    (x + (self.x - self.old_x) * 20, y + (self.y - self.old_y) * 20))
-        offset_x = (self.elapsed_movement / Main.animation_length) * (self.x - self.old_x) * 20
-        offset_y = (self.elapsed_movement / Main.animation_length) * (self.y - self.old_y) * 20
-        WINDOW.blit(self.image, (x + offset_x, y + offset_y))
-
-    # checks for collision with player, return npc name or empty string
-    @classmethod
-    def collide(cls, player):
-        return next((each.name for each in cls.npcs if each.x == player.x and each.y == player.y), "")
-
-    @classmethod
-    def is_any_npc(cls, x, y):
-        return any(True for each in cls.npcs if each.x == x and each.y == y)
-
-    @classmethod
-    def clear(cls):
-        cls.npcs.clear()
-
-    @classmethod
-    def render_all_npc(cls, player):
-        for each in cls.npcs:
-            each.render(player)
-
-    @classmethod
-    def move_all_npc(cls, player):
-        for npc in cls.npcs:
-            npc.npc_move(player)
-        cls.elapsed_movement = 0
-        cls.can_kill = False
-        pygame.event.post(pygame.event.Event(NPC_RENDER))
-
-    @classmethod
-    def update_player_coordinates(cls, player: Player):
-        cls.player_coordinates = (player.x, player.y)
-
-
 class Button:
     def __init__(self, x: int, y: int, width: int, height: int, bg_color: RGB, hover_color: RGB, outline_thickness: int,
                  outline_color: RGB, text: str = "", fontsize: int = 0, font_color: RGB = (255, 255, 255),
@@ -1182,9 +1170,10 @@ class Button:
         self.active_color = active_color
 
     def draw(self, window: pygame.Surface, hover: bool = False):
-        pygame.draw.rect(window, self.outline_color, (self.x - self.outline_thickness, self.y - self.outline_thickness,
-                                                      self.width + self.outline_thickness * 2,
-                                                      self.height + self.outline_thickness * 2), 6, 6)
+        Display.mark(pygame.draw.rect(window, self.outline_color,
+                                      (self.x - self.outline_thickness, self.y - self.outline_thickness,
+                                       self.width + self.outline_thickness * 2,
+                                       self.height + self.outline_thickness * 2), 6, 6))
         pygame.draw.rect(window, self.active_color if self.active else self.hover_color if hover else self.bg_color,
                          (self.x, self.y, self.width, self.height))
 
@@ -1192,10 +1181,9 @@ class Button:
             self.draw_text(window, hover)
 
     def draw_text(self, window: pygame.Surface, hover: bool):
-        font = pygame.font.SysFont(self.font, self.fontsize)
-        text = font.render(self.text, True, self.font_hover_color if hover else self.font_color)
-        window.blit(text, (self.x + (self.width / 2 - text.get_width() / 2),
-                           self.y + (self.height / 2 - text.get_height() / 2)))
+        text = Assets.text(self.text, self.font, self.fontsize, self.font_hover_color if hover else self.font_color)
+        Display.mark(window.blit(text, (self.x + (self.width / 2 - text.get_width() / 2),
+                                        self.y + (self.height / 2 - text.get_height() / 2))))
 
     # checks if mouse is on button and if is it also draws the hover state, returns TRUE/FALSE
     def is_over(self, window: pygame.Surface, pos: tuple[int, int]):
@@ -1245,110 +1233,172 @@ class InputBox(Button):
                     self.text += event.unicode
 
 
+# the database connection lives on its own thread, everything that talks to mongo is handed to it through Network.submit
+# and comes back as a Future, so a slow or missing connection never holds up a frame
+class Network:
+    requests = queue.Queue()
+    thread = None
+    connection: Future  # of the first connect, the game plays offline until there is one
+
+    @classmethod
+    def start(cls):
+        Database.outbox = Outbox(os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_files",
+                                              "outbox.jsonl"))
+        Database.cache = BoardCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_files", "jsons",
+                                                 "online_highscores.json"))
+        cls.thread = threading.Thread(target=cls.run, name="network", daemon=True)
+        cls.thread.start()
+        cls.connection = cls.submit(Database.connect)
+
+    # func(*args) runs on the network thread, the future gets its result or exception
+    @classmethod
+    def submit(cls, func, *args):
+        future = Future()
+        cls.requests.put((future, func, args))
+        return future
+
+    # with nothing to do the outbox is retried once its backoff is over
+    @classmethod
+    def run(cls):
+        while True:
+            try:
+                future, func, args = cls.requests.get(timeout=OUTBOX_CHECK_INTERVAL)
+            except queue.Empty:
+                future, func, args = Future(), Database.flush, ()
+                if not Database.outbox.due():
+                    continue
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except Exception as exception:
+                logging.getLogger(__name__).info(f"network request {func.__name__} failed: {exception!r}")
+                future.set_exception(exception)
+
+    # keeps the screen responsive with text while the future isn't done, returns its result or None if it failed or
+    # took longer than timeout seconds
+    @classmethod
+    def wait(cls, future: Future, text: str = "Loading...", timeout: float = NETWORK_TIMEOUT):
+        loading = Button(0, HEIGHT // 2 - 100, WIDTH, 200, COLORS["black"], COLORS["black"], 0, COLORS["black"],
+                         text, 40)
+        start = pygame.time.get_ticks()
+        while not future.done() and pygame.time.get_ticks() - start < timeout * 1000:
+            Main.clock.tick(Main.settings["max fps"])
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+            WINDOW.fill(COLORS["black"])
+            loading.draw(WINDOW)
+            Display.flip()
+        if not future.done() or future.exception():
+            return None
+        return future.result()
+
+
+# methods without self run on the network thread (through Network.submit), except sync_online, sync_all and sync_boards
 class Database:
     active = None
+    client = None  # made by the first connect and kept, later connects only ask for the version again
+    version = None  # newest game version, known once connected
+    outbox: Outbox  # writes waiting for the database
+    cache: BoardCache  # online boards, filled on the network thread, the menu peeks at them through its lock
+    replays = {}  # verify_speedrun results of the speedruns flush has checked
 
     def __init__(self, db, col):
-        self.cluster = MongoClient(CONNECTION_TO_DATABASE, connectTimeoutMS=9000)
+        from pymongo import MongoClient  # imported here, pymongo is only needed once the game connects
+        self.cluster = MongoClient(os.environ["CONECTION_TO_DATABASE"], connectTimeoutMS=9000,
+                                   serverSelectionTimeoutMS=9000)
         self.db = self.cluster[db]
         self.col = self.db[col]
+        self.leaderboards = Leaderboards(self.cluster["highscores"])
         self.active = self
 
     def change_db_col(self, db, col):
         self.db = self.cluster[db]
         self.col = self.db[col]
 
-    def sync_all(self):
-        all_modes = ("endless_all", "endless_all_custom", "speedrun_easy", "speedrun_easy_custom",
-                     "speedrun_normal", "speedrun_normal_custom", "speedrun_hard", "speedrun_hard_custom",
-                     "speedrun_full view", "speedrun_full view_custom")
-        for each in all_modes:
-            items = each.split("_")
-            game_mode = items[0]
-            Main.settings["difficulty"] = items[1]
-            Main.seed = "custom" if len(items) == 3 else "random"
-            self.sync_online(game_mode)
-
-    def sync_online(self, game_mode):
-        if game_mode == "speedrun":
-            string = f"{game_mode}_{Main.settings['difficulty'].lower()}" + f"{'' if Main.seed == 'random' else '_custom'}"
-        else:
-            string = f"{game_mode}_all" + f"{'' if Main.seed == 'random' else '_custom'}"
-        self.change_db_col("highscores", string)
-
-        my_list = copy.deepcopy(Main.highscores[string])
-        for i in range(1, 10):
-            if x := self.col.find_one({"_id": i}):
-                my_list.append(x)
-
-        for x in range(len(my_list)):
-            my_list[x]["_id"] = 0
-            my_list[x]["place"] = 0
-        my_list = [dict(t) for t in {tuple(d.items()) for d in my_list}]
-
-        if game_mode == "speedrun":
-            my_list.sort(key=lambda item: item["time"])
-        else:
+    # the connection, made first if there isn't one yet, raises if the database can't be reached
+    # the same client is tried every time, a new one would leave the monitor threads of the old one running
+    @classmethod
+    def connect(cls):
+        if cls.active is None:
+            if cls.client is None:
+                cls.client = Database("game_version", "game_version")
+            cls.version = cls.client.cluster["game_version"]["game_version"].find_one({"_id": 0})["game_version"]
+            global CONNECTED
+            CONNECTED = True
+            cls.active = cls.client
+        return cls.active
 
-            my_list.sort(key=lambda item: item["score"], reverse=True)
+    @classmethod
+    def fetch_board(cls, board: str):
+        return cls.cache.get(cls.connect().leaderboards, board)
 
-        my_list = my_list[:9]
-        for x in range(len(my_list)):
-            my_list[x]["_id"] = x + 1
-            my_list[x]["place"] = x + 1
-        for i in range(1, 10):
-            self.col.delete_one({"_id": i})
-            self.col.insert_one(my_list[i - 1])
+    # sends everything in the outbox, pending writes to a board go as one
+    @classmethod
+    def flush(cls):
+        count, boards, errors = cls.outbox.batch()
+        boards = {board: cls.verified(board, entries) for board, entries in boards.items()}
+        try:
+            database = cls.connect()
+            for board, (etag, entries) in database.leaderboards.sync(boards).items():
+                cls.cache.put(board, etag, entries)
+            for error in errors:
+                database.send_error(error["description"])
+        except Exception:
+            cls.outbox.failed()
+            raise
+        cls.outbox.sent(count)
+
+    # the speedruns of the board whose replay plays back to the times they claim, checked right before every upload
+    # because highscores.json can be edited, runs without a replay (the bots, older versions) stay local
+    # results are kept by everything verify_speedrun reads, so an entry is only played again once it's changed
+    @classmethod
+    def verified(cls, board: str, entries: list):
+        if not board.startswith("speedrun"):
+            return entries
+        difficulty = board.split("_")[1]
+        passed = []
+        for entry in entries:
+            key = json.dumps([difficulty] + [entry.get(name) for name in ("seed", "time", "level times", "replay")])
+            if key not in cls.replays:
+                cls.replays[key] = verify_speedrun(entry, difficulty)
+            if cls.replays[key]:
+                passed.append(entry)
+        return passed
 
     @classmethod
-    def initial_connection(cls):
-        loading = Button(0, HEIGHT // 2 - 100, WIDTH, 200, COLORS["black"], COLORS["black"], 0, COLORS["black"],
-                         "Loading...", 40)
-        loading.draw(WINDOW)
-        pygame.display.flip()
+    def sync_all(cls):
+        return cls.sync_boards(BOARDS)
 
-        try:
-            state = Database("game_version", "game_version")
-        except pymongo.errors.ConfigurationError:
-            loading.text = "Couldn't connect, try again later"
-            WINDOW.fill(COLORS["black"])
-            loading.draw(WINDOW)
-            pygame.display.flip()
-            pygame.time.delay(3000)
-            pygame.quit()
-            sys.exit()
+    @classmethod
+    def sync_online(cls, game_mode):
+        return cls.sync_boards((board_name(game_mode, Main.settings["difficulty"], Main.seed),))
 
-        global CONNECTED
-        CONNECTED = True
-        cls.active = state
-        current = state.col.find_one({"_id": 0})
-        if current["game_version"] != VERSION:
-            loading.text = "New version is available, click to enter the website or press any key to continue"
-        else:
-            loading.text = "Press any key to continue"
-        done = False
-        while not done:
-            WINDOW.fill(COLORS["black"])
-            loading.draw(WINDOW)
-            pygame.display.flip()
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN and current["game_version"] != VERSION:
-                    webbrowser.open_new_tab("https://czmatejt9.github.io")
-                elif event.type == pygame.KEYDOWN:
-                    done = True
+    # the local boards go to the outbox and are merged into the online ones in the background
+    @classmethod
+    def sync_boards(cls, boards: tuple):
+        for board in boards:
+            cls.outbox.add({"kind": "board", "board": board, "entries": Main.highscores[board]})
+        return Network.submit(cls.flush)
 
-    def send_error_data(self):
-        self.change_db_col("errors", "errors")
+    # the error log goes to the outbox and is sent in the background
+    @classmethod
+    def send_error_data(cls):
         with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_files", "errors.txt") ,
                   "rt", encoding="utf-8") as file:
             error_data = file.read()
+        cls.outbox.add({"kind": "error", "description": error_data})
+        return Network.submit(cls.flush)
+
+    def send_error(self, error_data: str):
+        self.change_db_col("errors", "errors")
         self.col.update_one({"_id": "main"}, {"$inc": {"index": 1}})
         index = self.col.find_one({"_id": "main"})
         index_number = index["index"]
-        self.col.insert_one({"_id": index_number, "ip_address": IP_ADDRESS, "description": error_data})
+        self.col.insert_one({"_id": index_number, "ip_address": socket.gethostbyname(socket.gethostname()),
+                             "description": error_data})
 
 
 # creates clickable menu from buttons, change settings for buttons in here
@@ -1380,18 +1430,26 @@ class Menu:
                    for i, each in enumerate(self.content) if each]
 
         # menu loop
+        profile = Profiler.loop("menu")
+        Display.mark_all()
         while True:
+            profile.frame()
             event_q = True
             window.fill(COLORS["black"])
             if self.func:
                 event_q = self.func(self.arg)
+            profile.mark("func")
 
             Main.clock.tick(Main.settings["max fps"])
+            profile.mark("wait")
             if event_q:
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         pygame.quit()
                         sys.exit()
+                    if event.type == pygame.KEYDOWN:
+                        Profiler.key(event.key)
+            profile.mark("events")
 
             # drawing buttons
             header_button.draw(window)
@@ -1408,53 +1466,14 @@ class Menu:
                         return each.text
             if not hand:
                 pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
+            profile.mark("buttons")
 
             # updating screen
-            pygame.display.flip()
-
-
-# function that finds the shortest path between two given points in the maze
-def path_finder(maze_object: Maze, start_pos: tuple, end: tuple, wall_block: str = "w"):
-    maze = maze_object.maze
-    q = queue.Queue()
-    q.put((start_pos, [start_pos]))
-    visited = set()
-
-    while not q.empty():
-        current_pos, path = q.get()
-        col, row = current_pos
-
-        if (col, row) == end:
-            return path
-
-        neighbours = find_neighbours(maze, row, col)
-        for neighbour in neighbours:
-            # removing paths that backtrack or lead to walls
-            if neighbour in visited:
-                continue
-            r, c = neighbour
-            if maze[r][c] == wall_block:
-                continue
-
-            new_path = path + [neighbour]
-            q.put((neighbour, new_path))
-            visited.add(neighbour)
-    raise ValueError("path not found")
-
-
-# sub function for the path_finder func
-def find_neighbours(maze: list, row: int, col: int):
-    neighbours = []
-    if row > 0:
-        neighbours.append((col, row - 1))
-    if row < len(maze[0]) - 1:
-        neighbours.append((col, row + 1))
-    if col > 0:
-        neighbours.append((col - 1, row))
-    if col < len(maze) - 1:
-        neighbours.append((col + 1, row))
-
-    return neighbours
+            if overlay := profile.draw(window, Assets.font("consolas", 16)):
+                Display.mark(overlay)
+                profile.mark("profiler")
+            Display.update()
+            profile.mark("display")
 
 
 # logging to file
@@ -1477,13 +1496,15 @@ def handle_exception(exc_type, exc_value, exc_traceback):
                              COLORS["light_grey"], 5, COLORS["white"], "Send data", 24)
     exit_button = Button(WIDTH // 2 - 200 // 2, HEIGHT // 2 - 50 // 2 + 100, 200, 50, COLORS["black"],
                              COLORS["light_grey"], 5, COLORS["white"], "Quit", 24)
-    sent = False
+    sending = None
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
 
+        if sending and sending.done():
+            send_data_button.text = "Saved, it will be sent later" if sending.exception() else "Data sent! Thanks!"
         WINDOW.fill(COLORS["black"])
         error_button.draw(WINDOW)
         send_data_button.draw(WINDOW)
@@ -1492,24 +1513,25 @@ def handle_exception(exc_type, exc_value, exc_traceback):
             if pygame.mouse.get_pressed()[0]:
                 pygame.quit()
                 sys.exit()
-        elif not sent and send_data_button.is_over(WINDOW, pygame.mouse.get_pos()):
+        elif not sending and send_data_button.is_over(WINDOW, pygame.mouse.get_pos()):
             if pygame.mouse.get_pressed()[0]:
-                Database.active.send_error_data()
-                sent = True
+                sending = Database.send_error_data()
                 send_data_button.outline_thickness = 0
-                send_data_button.text = "Data sent! Thanks!"
+                send_data_button.text = "Sending..."
         else:
             pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
 
-        pygame.display.flip()
+        Display.flip()
 
 
 def main():
     logging_setup()
-    Database.initial_connection()
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "variables.env"))
+    Main.load_files()
+    Network.start()
 
     main_menu = Menu("MAIN MENU", ("Speedrun mode", "Endless mode", "Online Highscores", "Local Highscores",
-                                   "Controls", "Settings", "Quit"))
+                                   "Controls", "Settings", "Quit"), Main.connection_status, None)
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -1551,21 +1573,27 @@ def main():
                         break
                 else:
                     pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-                pygame.display.flip()
+                Display.flip()
 
         elif selection in ["Online Highscores", "Local Highscores"]:
             menu = Menu(f"Select {selection.split()[0].upper()} Highscores to display",
-                        ("endless_all", "endless_all_custom", "speedrun_easy", "speedrun_easy_custom",
-                         "speedrun_normal", "speedrun_normal_custom", "speedrun_hard", "speedrun_hard_custom",
-                         "speedrun_full view", "speedrun_full view_custom", "Back"), outline=0, button_height=30)
+                        BOARDS + ("Back",), outline=0, button_height=30)
             while True:
                 Main.clock.tick(Main.settings["max fps"])
                 sub_selection = menu.mainloop(WINDOW)
                 if sub_selection == "Back":
                     break
                 if selection == "Online Highscores":
-                    Database.active.change_db_col("highscores", sub_selection)
-                    my_list = [Database.active.col.find_one({"_id": i}) for i in range(1, 10)]
+                    # a board checked with the database within BOARD_TTL shows right away, an older one only if the
+                    # database doesn't answer within STALE_BOARD_WAIT, a board never seen is waited for
+                    my_list = Database.cache.peek(sub_selection)
+                    if my_list is None or not Database.cache.fresh(sub_selection):
+                        fetched = Network.wait(Network.submit(Database.fetch_board, sub_selection),
+                                               timeout=NETWORK_TIMEOUT if my_list is None else STALE_BOARD_WAIT)
+                        my_list = my_list if fetched is None else fetched
+                    if my_list is None:
+                        Menu("Couldn't load the online highscores", ("Back",)).mainloop(WINDOW)
+                        continue
                 else:
                     my_list = Main.highscores[sub_selection]
 
@@ -0,0 +1,708 @@
+import random
+from array import array
+from itertools import islice
+
+# tiles, every tile is stored in MazeGrid as the byte code of its character
+WALL = "w"
+CELL = "c"
+PASSAGE = "p"
+START = "S"
+FINISH = "F"
+KEY = "Q"
+WALL_CODE = ord(WALL)
+CELL_CODE = ord(CELL)
+PASSAGE_CODE = ord(PASSAGE)
+START_CODE = ord(START)
+FINISH_CODE = ord(FINISH)
+KEY_CODE = ord(KEY)
+
+
+# compact maze grid, one byte per tile in a flat bytearray indexed y * width + x
+# grid[row][col] still works (returns/takes one char strings) so code written for the old list of lists keeps working
+class MazeGrid:
+    __slots__ = ("width", "height", "tiles")
+
+    def __init__(self, width: int, height: int, tiles: bytearray = None):
+        self.width = width
+        self.height = height
+        self.tiles = bytearray(WALL.encode() * (width * height)) if tiles is None else tiles
+        if len(self.tiles) != width * height:
+            raise ValueError("Tiles don't match the grid size")
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, row: int):
+        if not 0 <= row < self.height:
+            raise IndexError("row out of range")
+        return GridRow(self, row)
+
+    def __iter__(self):
+        return (GridRow(self, row) for row in range(self.height))
+
+    def __eq__(self, other):
+        if isinstance(other, MazeGrid):
+            return self.width == other.width and self.tiles == other.tiles
+        return NotImplemented
+
+    def __str__(self):
+        return "\n".join(self.tiles[y * self.width:(y + 1) * self.width].decode() for y in range(self.height))
+
+    def get(self, x: int, y: int):
+        return chr(self.tiles[y * self.width + x])
+
+    def set(self, x: int, y: int, tile: str):
+        self.tiles[y * self.width + x] = ord(tile)
+
+    def is_tile(self, x: int, y: int, tile: str):
+        return self.tiles[y * self.width + x] == ord(tile)
+
+    # counts the 4 direct neighbours that are the given tile, (x, y) can't be on the border
+    def count_neighbours(self, x: int, y: int, tile: str):
+        tiles, index, code = self.tiles, y * self.width + x, ord(tile)
+        return ((tiles[index + 1] == code) + (tiles[index - 1] == code)
+                + (tiles[index + self.width] == code) + (tiles[index - self.width] == code))
+
+    def to_lists(self):
+        return [list(row) for row in self]
+
+
+# one row of MazeGrid, only a view, writes go straight to the grid
+class GridRow:
+    __slots__ = ("grid", "offset")
+
+    def __init__(self, grid: MazeGrid, row: int):
+        self.grid = grid
+        self.offset = row * grid.width
+
+    def __len__(self):
+        return self.grid.width
+
+    def __getitem__(self, col: int):
+        if not 0 <= col < self.grid.width:
+            raise IndexError("column out of range")
+        return chr(self.grid.tiles[self.offset + col])
+
+    def __setitem__(self, col: int, tile: str):
+        if not 0 <= col < self.grid.width:
+            raise IndexError("column out of range")
+        self.grid.tiles[self.offset + col] = ord(tile)
+
+    def __iter__(self):
+        return iter(self.grid.tiles[self.offset:self.offset + self.grid.width].decode())
+
+
+# generates a perfect maze (randomized Prim) as MazeGrid
+# default mode consumes the rng exactly like the old list based generator did, so old seeds still give the same mazes
+# fast mode uses swap-remove frontier instead, mazes are different for the same seed
+def generate_maze(width: int, height: int, rng: random.Random, fast: bool = False):
+    grid = MazeGrid(width, height)
+    if fast:
+        _generate_fast(grid.tiles, width, height, rng)
+    elif width * height <= LIST_FRONTIER_MAX_TILES:
+        _generate_exact_list(grid.tiles, width, height, rng)
+    else:
+        _generate_exact(grid.tiles, width, height, rng)
+    return grid
+
+
+# frontier as a plain list of alive walls, removing is a scan but it runs in C, so up to about this many tiles it's
+# faster than the fenwick tree, both give the same mazes
+LIST_FRONTIER_MAX_TILES = 30000
+
+
+# same frontier as the old generator, minus the walls it would have filtered out before every pick
+def _generate_exact_list(grid: bytearray, width: int, height: int, rng: random.Random):
+    cell, passage = CELL_CODE, PASSAGE_CODE
+    walls = []  # tile indexes
+    copies = bytearray(width * height)  # how many times is a tile in walls
+    pick = rng._randbelow  # what rng.choice picks with
+
+    # sub function that opens a cell and adds walls around it (same order as the old add_walls)
+    def add_walls(x: int, y: int):
+        if not (0 < x < width - 1 and 0 < y < height - 1):
+            return
+        index = y * width + x
+        grid[index] = cell
+        for nx, ny, neighbour in ((x + 1, y, index + 1), (x, y + 1, index + width),
+                                  (x - 1, y, index - 1), (x, y - 1, index - width)):
+            if 1 <= nx <= width - 2 and 1 <= ny <= height - 2 and grid[neighbour] != passage:
+                walls.append(neighbour)
+                copies[neighbour] += 1
+
+    x = rng.randrange(1, width - 1, 2)
+    y = rng.randrange(1, height - 1, 2)  # border compensation
+    add_walls(x, y)
+    while walls:
+        index = walls[pick(len(walls))]
+        right = grid[index + 1] == cell
+        down = grid[index + width] == cell
+        left = grid[index - 1] == cell
+        up = grid[index - width] == cell
+        if right + down + left + up == 1:
+            grid[index] = passage
+            for _ in range(copies[index]):
+                walls.remove(index)
+            copies[index] = 0
+            x, y = index % width, index // width
+            if right:
+                add_walls(x - 1, y)
+            elif left:
+                add_walls(x + 1, y)
+            elif down:
+                add_walls(x, y - 1)
+            else:
+                add_walls(x, y + 1)
+        else:
+            walls.remove(index)  # first copy, like the old generator
+            copies[index] -= 1
+
+
+# order preserving frontier, every wall ever added gets a slot, alive slots are counted in a fenwick tree so picking
+# the n-th alive wall (rng.choice on the old list) and deleting a wall are both O(log n)
+def _generate_exact(grid: bytearray, width: int, height: int, rng: random.Random):
+    cell, passage = CELL_CODE, PASSAGE_CODE
+    capacity = 4 * ((width - 1) // 2 + 1) * ((height - 1) // 2 + 1) + 4
+    tree = [0] * (capacity + 1)
+    slot_cell = [0] * capacity
+    slots = {}  # cell index -> alive slots in insertion order
+    top_bit = 1 << (capacity.bit_length() - 1)
+    pick = rng._randbelow  # what rng.choice picks with
+    used = 0
+    alive = 0
+
+    # sub function that opens a cell and adds walls around it (same order as the old add_walls)
+    def add_walls(x: int, y: int):
+        nonlocal used, alive
+        if not (0 < x < width - 1 and 0 < y < height - 1):
+            return
+        grid[y * width + x] = cell
+        for nx, ny in ((x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)):
+            # walls on the border or already turned into passages would be filtered out before the next pick anyway
+            if not (1 <= nx <= width - 2 and 1 <= ny <= height - 2):
+                continue
+            index = ny * width + nx
+            if grid[index] == passage:
+                continue
+            slot_cell[used] = index
+            slots.setdefault(index, []).append(used)
+            i = used + 1
+            while i <= capacity:
+                tree[i] += 1
+                i += i & -i
+            used += 1
+            alive += 1
+
+    def kill(slot: int):
+        nonlocal alive
+        i = slot + 1
+        while i <= capacity:
+            tree[i] -= 1
+            i += i & -i
+        alive -= 1
+
+    # selecting a starting cell
+    x = rng.randrange(1, width - 1, 2)
+    y = rng.randrange(1, height - 1, 2)  # border compensation
+    add_walls(x, y)
+    while alive:
+        # finding the slot of the k-th alive wall
+        remaining = pick(alive) + 1
+        position = 0
+        step = top_bit
+        while step:
+            following = position + step
+            if following <= capacity and tree[following] < remaining:
+                position = following
+                remaining -= tree[following]
+            step >>= 1
+        index = slot_cell[position]
+        x, y = index % width, index // width
+
+        # counting passages around wall
+        right = grid[index + 1] == cell
+        down = grid[index + width] == cell
+        left = grid[index - 1] == cell
+        up = grid[index - width] == cell
+        if right + down + left + up == 1:
+            grid[index] = passage
+            # every copy of a passage is dropped
+            for slot in slots.pop(index):
+                kill(slot)
+            if right:
+                add_walls(x - 1, y)
+            elif left:
+                add_walls(x + 1, y)
+            elif down:
+                add_walls(x, y - 1)
+            else:
+                add_walls(x, y + 1)
+        else:
+            # list.remove dropped the first copy, not necessarily the picked one
+            copies = slots[index]
+            kill(copies.pop(0))
+            if not copies:
+                del slots[index]
+
+
+# swap-remove frontier with membership bitmap, O(1) per wall
+def _generate_fast(grid: bytearray, width: int, height: int, rng: random.Random):
+    cell, passage = CELL_CODE, PASSAGE_CODE
+    in_frontier = bytearray(width * height)
+    frontier = []
+    rand = rng.random
+
+    def add_walls(x: int, y: int):
+        if not (0 < x < width - 1 and 0 < y < height - 1):
+            return
+        index = y * width + x
+        grid[index] = cell
+        for neighbour, nx, ny in ((index + 1, x + 1, y), (index + width, x, y + 1),
+                                  (index - 1, x - 1, y), (index - width, x, y - 1)):
+            if in_frontier[neighbour] or grid[neighbour] == passage \
+                    or not (1 <= nx <= width - 2 and 1 <= ny <= height - 2):
+                continue
+            in_frontier[neighbour] = 1
+            frontier.append(neighbour)
+
+    x = rng.randrange(1, width - 1, 2)
+    y = rng.randrange(1, height - 1, 2)
+    add_walls(x, y)
+    while frontier:
+        i = int(rand() * len(frontier))
+        index = frontier[i]
+        last = frontier.pop()
+        if i < len(frontier):
+            frontier[i] = last
+        in_frontier[index] = 0
+
+        right = grid[index + 1] == cell
+        down = grid[index + width] == cell
+        left = grid[index - 1] == cell
+        up = grid[index - width] == cell
+        if right + down + left + up == 1:
+            grid[index] = passage
+            x, y = index % width, index // width
+            if right:
+                add_walls(x - 1, y)
+            elif left:
+                add_walls(x + 1, y)
+            elif down:
+                add_walls(x, y - 1)
+            else:
+                add_walls(x, y + 1)
+
+
+# breadth first search from start (x, y) to the end tile (x, y), or to the closest tile of the given type if end is None
+# returns the path as list of (x, y) with both ends included, with distance_only returns (steps, reached (x, y)) instead
+# neighbours are visited left, right, up, down so ties between equally close tiles end the same as the old path_finder
+def find_path(grid: MazeGrid, start: tuple, end: tuple = None, tile: str = None, blocked: str = WALL,
+              distance_only: bool = False):
+    width, size, tiles, blocked = grid.width, grid.width * grid.height, grid.tiles, ord(blocked)
+    origin = start[1] * width + start[0]
+    target = end[1] * width + end[0] if end is not None else -1
+    code = ord(tile) if tile is not None else -1
+    parent = array("i", [-1]) * size
+    parent[origin] = origin
+
+    found = -1
+    if origin == target or tiles[origin] == code:
+        found = origin
+    else:
+        queue = [origin]
+        # the list grows while it's being iterated, that makes it the bfs queue without any popping
+        for current in queue:
+            x = current % width
+            for neighbour in (current - 1 if x else -1, current + 1 if x < width - 1 else -1,
+                              current - width, current + width):
+                if not 0 <= neighbour < size or parent[neighbour] != -1 or tiles[neighbour] == blocked:
+                    continue
+                parent[neighbour] = current
+                if neighbour == target or tiles[neighbour] == code:
+                    found = neighbour
+                    break
+                queue.append(neighbour)
+            if found != -1:
+                break
+    if found == -1:
+        raise ValueError("path not found")
+
+    if distance_only:
+        steps, current = 0, found
+        while current != origin:
+            current = parent[current]
+            steps += 1
+        return steps, (found % width, found // width)
+    path, current = [found], found
+    while current != origin:
+        current = parent[current]
+        path.append(current)
+    path.reverse()
+    return [(i % width, i // width) for i in path]
+
+
+# shortest paths in a perfect maze, built once from the grid with one traversal
+# generated mazes are trees, so the path between two tiles is unique: climb from both ends to their common ancestor
+# if the grid has loops (is_tree is False) the answers are only valid from the root, callers should fall back to bfs
+class PathOracle:
+    def __init__(self, grid: MazeGrid):
+        self.width = grid.width
+        self.is_tree = True
+        width, size, tiles, wall = grid.width, grid.width * grid.height, grid.tiles, WALL_CODE
+        self.parent = parent = array("i", [-1]) * size
+        self.depth = depth = array("i", [-1]) * size
+        self.component = component = array("i", [-1]) * size
+        self.order = order = []  # every reached tile, parents always before their children
+        last_row = size - width
+
+        for root in range(size):
+            if tiles[root] == wall or depth[root] != -1:
+                continue
+            depth[root] = 0
+            component[root] = root
+            order.append(root)
+            # order doubles as the bfs queue of this component
+            for current in islice(order, len(order) - 1, None):
+                x = current % width
+                if 0 < x < width - 1 and width <= current < last_row:
+                    neighbours = (current - width, current + width, current - 1, current + 1)
+                else:
+                    neighbours = [neighbour for neighbour in (current - width, current + width,
+                                                              current - 1 if x else -1,
+                                                              current + 1 if x < width - 1 else -1)
+                                  if 0 <= neighbour < size]
+                above = parent[current]
+                level = depth[current] + 1
+                for neighbour in neighbours:
+                    if tiles[neighbour] == wall or neighbour == above:
+                        continue
+                    if depth[neighbour] != -1:
+                        self.is_tree = False  # second way into a tile means a loop
+                        continue
+                    parent[neighbour] = current
+                    depth[neighbour] = level
+                    component[neighbour] = root
+                    order.append(neighbour)
+
+    # path between two tile indexes, both ends included
+    def path_indices(self, start: int, end: int):
+        parent, depth = self.parent, self.depth
+        if depth[start] == -1 or depth[end] == -1 or self.component[start] != self.component[end]:
+            raise ValueError("path not found")
+        head, tail = [start], [end]
+        a, b = start, end
+        while depth[a] > depth[b]:
+            a = parent[a]
+            head.append(a)
+        while depth[b] > depth[a]:
+            b = parent[b]
+            tail.append(b)
+        while a != b:
+            a = parent[a]
+            b = parent[b]
+            head.append(a)
+            tail.append(b)
+        tail.pop()  # common ancestor is already in head
+        tail.reverse()
+        return head + tail
+
+    # path between two (x, y) tiles as list of (x, y)
+    def path(self, start: tuple, end: tuple):
+        width = self.width
+        return [(i % width, i // width)
+                for i in self.path_indices(start[1] * width + start[0], end[1] * width + end[0])]
+
+    # number of steps between two (x, y) tiles
+    def distance(self, start: tuple, end: tuple):
+        parent, depth, width = self.parent, self.depth, self.width
+        a, b = start[1] * width + start[0], end[1] * width + end[0]
+        if depth[a] == -1 or depth[b] == -1 or self.component[a] != self.component[b]:
+            raise ValueError("path not found")
+        steps = 0
+        while depth[a] > depth[b]:
+            a = parent[a]
+            steps += 1
+        while depth[b] > depth[a]:
+            b = parent[b]
+            steps += 1
+        while a != b:
+            a = parent[a]
+            b = parent[b]
+            steps += 2
+        return steps
+
+
+# steps from every tile to one target tile (x, y), one bfs from the target shared by everyone walking towards it
+# a tile steps to its first neighbour one step closer in the order left, right, up, down, that is the same step the
+# path of find_path from that tile would start with, loops or not
+# with complete=False the bfs runs a few tiles at a time through expand, tiles it reached already have their final
+# distance and step, the closest ones come first
+class FlowField:
+    def __init__(self, grid: MazeGrid, target: tuple, blocked: str = WALL, complete: bool = True):
+        self.width = grid.width
+        self.target = target
+        self.tiles, self.blocked = grid.tiles, ord(blocked)
+        self.distance = array("i", [-1]) * (grid.width * grid.height)  # -1 where the bfs didn't get (yet)
+        origin = target[1] * grid.width + target[0]
+        self.distance[origin] = 0
+        self.queue = [origin]
+        self.position = 0  # tiles of the queue before it had their neighbours looked at
+        if complete:
+            self.expand()
+
+    @property
+    def done(self):
+        return self.position == len(self.queue)
+
+    # looks at the neighbours of up to limit more tiles, all of them without a limit, returns how many it did
+    def expand(self, limit: int = None):
+        width, size, tiles, blocked, distance = self.width, len(self.distance), self.tiles, self.blocked, self.distance
+        queue = self.queue
+        count = 0
+        # the list grows while it's being iterated, that makes it the bfs queue without any popping
+        for current in islice(queue, self.position, None):
+            x = current % width
+            steps = distance[current] + 1
+            for neighbour in (current - 1 if x else -1, current + 1 if x < width - 1 else -1,
+                              current - width, current + width):
+                if 0 <= neighbour < size and distance[neighbour] == -1 and tiles[neighbour] != blocked:
+                    distance[neighbour] = steps
+                    queue.append(neighbour)
+            count += 1
+            if count == limit:
+                break
+        self.position += count
+        return count
+
+    # steps from (x, y) to the target, -1 if it can't get there or the bfs didn't get there yet
+    def steps(self, x: int, y: int):
+        return self.distance[y * self.width + x]
+
+    def reached(self, x: int, y: int):
+        return self.distance[y * self.width + x] != -1 or self.done
+
+    # tile (x, y) one step closer to the target, the same tile on the target or where the target can't be reached
+    def step(self, x: int, y: int):
+        width, distance = self.width, self.distance
+        current = y * width + x
+        closer = distance[current] - 1
+        if closer < 0:
+            return x, y
+        if x and distance[current - 1] == closer:
+            return x - 1, y
+        if x < width - 1 and distance[current + 1] == closer:
+            return x + 1, y
+        if current >= width and distance[current - width] == closer:
+            return x, y - 1
+        return x, y + 1
+
+
+# straight lines of sight in a maze, two tiles see each other when they're in the same row or column without a wall
+# between them
+# every tile keeps where the open run of its row and of its column starts and ends, built from the grid once
+class SightLines:
+    def __init__(self, grid: MazeGrid):
+        width, height, tiles = grid.width, grid.height, grid.tiles
+        self.width = width
+        size = width * height
+        self.left, self.right = array("H", [0]) * size, array("H", [0]) * size  # x of the ends of the row run
+        self.top, self.bottom = array("H", [0]) * size, array("H", [0]) * size  # y of the ends of the column run
+        for y in range(height):
+            offset = y * width
+            for start, end in _open_runs(tiles[offset:offset + width]):
+                self.left[offset + start:offset + end + 1] = array("H", [start]) * (end + 1 - start)
+                self.right[offset + start:offset + end + 1] = array("H", [end]) * (end + 1 - start)
+        for x in range(width):
+            for start, end in _open_runs(tiles[x::width]):
+                self.top[x + start * width:x + end * width + 1:width] = array("H", [start]) * (end + 1 - start)
+                self.bottom[x + start * width:x + end * width + 1:width] = array("H", [end]) * (end + 1 - start)
+
+    # (x, y) sees (other_x, other_y) at most reach tiles away, both have to be open tiles
+    def sees(self, x: int, y: int, other_x: int, other_y: int, reach: int):
+        tile = y * self.width + x
+        if y == other_y:
+            return abs(x - other_x) <= reach and self.left[tile] <= other_x <= self.right[tile]
+        return x == other_x and abs(y - other_y) <= reach and self.top[tile] <= other_y <= self.bottom[tile]
+
+
+# (first, last) index of every run of tiles that aren't walls in a row or column of tiles
+def _open_runs(line: bytes):
+    wall = bytes((WALL_CODE,))
+    start = 0
+    while start < len(line):
+        end = line.find(wall, start)
+        if end == -1:
+            end = len(line)
+        if end > start:
+            yield start, end - 1
+        start = end + 1
+
+
+# most keys the exact key route is allowed to search through, held-karp grows with 2 ** keys
+MAX_EXACT_KEYS = 14
+
+
+# route that collects `required` of the keys from start and then walks to the finish, all tiles are (x, y)
+# default is the greedy route of the seed finder: always the closest key, ties broken in the order bfs reaches them
+# exact=True gives the shortest possible route instead (held-karp over the keys), seed_finder.EXACT_ROUTES
+# returns (keys in the order they are collected, steps of every walk including the last one to the finish)
+def key_route(grid: MazeGrid, oracle: PathOracle, start: tuple, keys, finish: tuple, required: int,
+              exact: bool = False):
+    keys = sorted(keys)
+    if required > len(keys):
+        raise ValueError("not enough keys")
+    if exact and len(keys) > MAX_EXACT_KEYS:
+        raise ValueError(f"exact route supports at most {MAX_EXACT_KEYS} keys")
+
+    # generated mazes are trees, the oracle answers a distance without searching, loops need a search
+    def distance(a: tuple, b: tuple):
+        return oracle.distance(a, b) if oracle.is_tree else find_path(grid, a, b, distance_only=True)[0]
+
+    if exact:
+        terminals = [start] + keys + [finish]
+        return _shortest_key_route(terminals, [[distance(a, b) for b in terminals] for a in terminals], required)
+
+    # one bfs to the closest key each time, on a copy where only the given keys are keys
+    scratch = MazeGrid(grid.width, grid.height, grid.tiles.replace(KEY.encode(), CELL.encode()))
+    for x, y in keys:
+        scratch.set(x, y, KEY)
+    route, legs, current = [], [], start
+    for _ in range(required):
+        steps, current = find_path(scratch, current, tile=KEY, distance_only=True)
+        scratch.set(*current, CELL)
+        route.append(current)
+        legs.append(steps)
+    legs.append(distance(current, finish))
+    return route, legs
+
+
+# held-karp over subsets of at most `required` keys, terminals/matrix have start first and finish last
+def _shortest_key_route(terminals: list, matrix: list, required: int):
+    keys = len(terminals) - 2
+    finish = keys + 1
+    # layers[size][(visited mask, last key)] = (steps so far, previous key)
+    layers = [{(1 << key, key): (matrix[0][key + 1], -1) for key in range(keys)}]
+    for _ in range(required - 1):
+        layer = {}
+        for (mask, last), (steps, _) in layers[-1].items():
+            for key in range(keys):
+                if mask >> key & 1:
+                    continue
+                state = (mask | 1 << key, key)
+                total = steps + matrix[last + 1][key + 1]
+                if state not in layer or total < layer[state][0]:
+                    layer[state] = (total, last)
+        layers.append(layer)
+
+    (mask, last), (steps, _) = min(layers[-1].items(), key=lambda item: item[1][0] + matrix[item[0][1] + 1][finish])
+    order = []
+    for layer in reversed(layers):
+        order.append(last)
+        previous = layer[(mask, last)][1]
+        mask &= ~(1 << last)
+        last = previous
+    order.reverse()
+    stops = [0] + [key + 1 for key in order] + [finish]
+    legs = [matrix[a][b] for a, b in zip(stops, stops[1:])]
+    return [terminals[key + 1] for key in order], legs
+
+
+GUARD_NAMES = ("Base", "Petr", "Alfons")
+
+
+# the maze of one level without anything pygame, main.Maze adds the images and drawing on top of it
+# everything here takes numbers from rng in the same order the game always did, so seeds give the same levels
+class Maze:
+    def __init__(self, width: int, height: int, rng: random.Random, fast_generation: bool = False,
+                 guard_count: int = None):
+        if width < 5 or height < 5:
+            raise ValueError("Width and height must be 5 or bigger")
+        self.width = width
+        self.height = height
+        self.rng = rng
+        self.fast_generation = fast_generation  # fast generator gives different mazes for the same seed
+        self.maze = self.maze_generator()
+        self.path_oracle = None
+        self.sight_lines = None
+        self.start, self.end = self.add_start_finish()
+        self.q_location = self.add_questions()
+        self.guards = self.add_guards(guard_count)
+
+    def maze_generator(self):
+        return generate_maze(self.width, self.height, self.rng, self.fast_generation)
+
+    def is_tile(self, x, y, tile):
+        return self.maze.tiles[y * self.width + x] == ord(tile)
+
+    def change_tile(self, x, y, tile):
+        index = y * self.width + x
+        # paths and sight lines only change when a wall appears or disappears
+        if WALL_CODE in (self.maze.tiles[index], ord(tile)):
+            self.path_oracle = self.sight_lines = None
+        self.maze.tiles[index] = ord(tile)
+
+    # the door lets the player out once they have enough keys, only main.Maze has anything to change for it
+    def open_exit(self):
+        pass
+
+    # shortest path lookups, built on first use and kept until a wall changes
+    def get_path_oracle(self):
+        if self.path_oracle is None:
+            self.path_oracle = PathOracle(self.maze)
+        return self.path_oracle
+
+    # straight lines of sight, built on first use and kept until a wall changes
+    def get_sight_lines(self):
+        if self.sight_lines is None:
+            self.sight_lines = SightLines(self.maze)
+        return self.sight_lines
+
+    def add_start_finish(self):
+        x = 1
+        y = self.rng.randint(1, self.height - 2)
+        while self.is_tile(x, y, WALL):
+            y = self.rng.randint(1, self.height - 2)
+        self.change_tile(x, y, START)
+        start = (x, y)
+
+        x = self.width - 2
+        y = self.rng.randint(1, self.height - 2)
+        while self.is_tile(x, y, WALL):
+            y = self.rng.randint(1, self.height - 2)
+        self.change_tile(x, y, FINISH)
+        end = (x, y)
+        return start, end
+
+    def add_questions(self):
+        location = set()
+        amount = max(self.height * self.width // 100 + 1, 2)
+        for _ in range(amount):
+            x = self.rng.randint(1, self.width - 2)
+            y = self.rng.randint(1, self.height - 2)
+            while self.maze.get(x, y) not in (CELL, PASSAGE) or (x + 1, y) in location \
+                    or (x - 1, y) in location or (x, y + 1) in location or (x, y - 1) in location:
+                x = self.rng.randint(1, self.width - 2)
+                y = self.rng.randint(1, self.height - 2)
+            self.change_tile(x, y, KEY)
+            location.add((x, y))
+        return location
+
+    # [(name, x, y), ...] of the guards, they start somewhere in the right half
+    # count is for horde levels, by default there's a guard per 600 tiles and 3 at most
+    def add_guards(self, count: int = None):
+        if count is None:
+            count = min((self.width * self.height + 100) // 600, 3)
+        guards = []
+        for _ in range(count):
+            name = self.rng.choice(GUARD_NAMES)
+            y = self.rng.randint(1, self.height - 2)
+            x = self.rng.randint(self.width // 2, self.width - 2)
+            while self.is_tile(x, y, WALL):
+                y = self.rng.randint(1, self.height - 2)
+                x = self.rng.randint(self.width // 2, self.width - 2)
+            guards.append((name, x, y))
+        return guards
+
+    def get_surrounding_walls(self, x, y):
+        return self.maze.count_neighbours(x, y, WALL)
+
@@ -0,0 +1,74 @@
+import os
+import json
+import time
+import threading
+from leaderboards import merge
+
+# writes for the database that haven't made it there yet, kept in an append-only file so they survive the game closing
+# records are {"kind": "board", "board": name, "entries": [...]} or {"kind": "error", "description": text}
+# pending writes to the same board are merged into one, everything is sent in one batch once the database is reachable
+RETRY_MIN = 5  # seconds before the first retry after a failed flush, doubles with every failure after that
+RETRY_MAX = 300
+
+
+class Outbox:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()  # records are added on the game thread and flushed on the network thread
+        self.records = self.load()
+        self.failures = 0
+        self.retry_at = 0  # time.monotonic() of the next automatic flush
+
+    # a line cut short by the game closing mid write is skipped
+    def load(self):
+        records = []
+        try:
+            with open(self.path, "rt", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        pass
+        except FileNotFoundError:
+            pass
+        return records
+
+    # on disk before it returns
+    def add(self, record: dict):
+        with self.lock:
+            with open(self.path, "at", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self.records.append(record)
+
+    # (number of records, {board: merged entries}, [error records]) of everything pending
+    def batch(self):
+        with self.lock:
+            records = list(self.records)
+        boards = {}
+        errors = []
+        for record in records:
+            if record["kind"] == "board":
+                boards[record["board"]] = merge(record["board"], boards.get(record["board"], []), record["entries"])
+            else:
+                errors.append(record)
+        return len(records), boards, errors
+
+    # the first count records were sent, the file keeps only the ones added since
+    def sent(self, count: int):
+        with self.lock:
+            del self.records[:count]
+            with open(self.path + ".tmp", "wt", encoding="utf-8") as file:
+                file.writelines(json.dumps(record) + "\n" for record in self.records)
+            os.replace(self.path + ".tmp", self.path)
+        self.failures = 0
+        self.retry_at = 0
+
+    def failed(self):
+        self.failures += 1
+        self.retry_at = time.monotonic() + min(RETRY_MIN * 2 ** (self.failures - 1), RETRY_MAX)
+
+    # something is waiting and the backoff is over
+    def due(self):
+        return bool(self.records) and time.monotonic() >= self.retry_at
@@ -0,0 +1,129 @@
+import os
+import csv
+import time
+from collections import deque
+from datetime import datetime
+import pygame
+
+# where the frames of a loop (Main.level, Menu.mainloop, Main.question) go, timed with time.perf_counter_ns
+# a loop calls frame() at the top of every frame and mark(section) after every section of it, the time since the
+# previous mark goes to that section, a section marked more than once in a frame adds up
+# a frame lasts until its last mark, so the time between two runs of a loop isn't counted
+# off until PROFILER_KEY is pressed, frame and mark return right away while it's off
+PROFILER_KEY = pygame.K_F3  # starts timing and shows the overlay, again stops it
+EXPORT_KEY = pygame.K_F4  # writes the kept frames of every loop to a csv in EXPORT_FOLDER
+EXPORT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_files")
+ROLLING_FRAMES = 300  # frames the percentiles are taken over
+KEPT_FRAMES = 20000  # frames of every loop kept for the csv
+OVERLAY_REFRESH = 250  # ms between redraws of the overlay text
+PERCENTILES = (50, 95, 99)
+
+
+class Profiler:
+    enabled = False
+    loops = {}  # name -> Profiler
+    exported = ""  # file name of the last csv, shown in the overlay
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = self.last = 0  # perf_counter_ns of the start and the last mark of the current frame, 0 if none
+        self.sections = {}  # section -> ns in the current frame
+        self.samples = {}  # section -> ns of the last ROLLING_FRAMES frames it was in, "frame" for whole frames
+        self.frames = deque(maxlen=KEPT_FRAMES)  # (start, {section: ns}) of finished frames
+        self.overlay = None  # rendered overlay text
+        self.drawn = 0  # pygame.time.get_ticks() of the overlay
+
+    # the same one every time for the same name
+    @classmethod
+    def loop(cls, name: str):
+        if name not in cls.loops:
+            cls.loops[name] = cls(name)
+        return cls.loops[name]
+
+    # KEYDOWN events of every loop go through here, returns True if the overlay was shown or hidden
+    @classmethod
+    def key(cls, key: int):
+        if key == PROFILER_KEY:
+            cls.enabled = not cls.enabled
+            for each in cls.loops.values():
+                each.start = 0
+                each.overlay = None
+            return True
+        if key == EXPORT_KEY and cls.enabled:
+            cls.export()
+        return False
+
+    def frame(self):
+        if not Profiler.enabled:
+            return
+        if self.start:
+            self.finish()
+        self.start = self.last = time.perf_counter_ns()
+        self.sections = {}
+
+    def mark(self, section: str):
+        if not Profiler.enabled or not self.start:
+            return
+        now = time.perf_counter_ns()
+        self.sections[section] = self.sections.get(section, 0) + now - self.last
+        self.last = now
+
+    def finish(self):
+        self.sections["frame"] = self.last - self.start
+        for section, ns in self.sections.items():
+            if section not in self.samples:
+                self.samples[section] = deque(maxlen=ROLLING_FRAMES)
+            self.samples[section].append(ns)
+        self.frames.append((self.start, self.sections))
+
+    # {section: (p50, p95, p99) in ms} over the last ROLLING_FRAMES frames
+    def percentiles(self):
+        result = {}
+        for section, samples in self.samples.items():
+            ordered = sorted(samples)
+            result[section] = tuple(ordered[min(len(ordered) * p // 100, len(ordered) - 1)] / 1e6
+                                    for p in PERCENTILES)
+        return result
+
+    # the overlay in the top right corner of the window, the text is rendered again every OVERLAY_REFRESH ms
+    # returns the rect it covers, None while the profiler is off
+    def draw(self, window: pygame.Surface, font: pygame.font.Font):
+        if not Profiler.enabled:
+            return None
+        now = pygame.time.get_ticks()
+        if self.overlay is None or now - self.drawn >= OVERLAY_REFRESH:
+            lines = [f"{self.name:<10}{'p50':>8}{'p95':>8}{'p99':>8} ms"]
+            lines += [f"{section:<10}" + "".join(f"{ms:>8.2f}" for ms in values)
+                      for section, values in self.percentiles().items()]
+            lines.append(f"F3 hide, F4 csv {Profiler.exported}")
+            rendered = [font.render(line, True, (255, 255, 255)) for line in lines]
+            self.overlay = pygame.Surface((max(line.get_width() for line in rendered) + 10,
+                                           sum(line.get_height() for line in rendered) + 10))
+            self.overlay.set_alpha(210)
+            y = 5
+            for line in rendered:
+                self.overlay.blit(line, (5, y))
+                y += line.get_height()
+            self.drawn = now
+        return window.blit(self.overlay, (window.get_width() - self.overlay.get_width() - 10, 70))
+
+    # every kept frame of every loop as a row: loop, frame number, start and length of the frame and of its sections
+    # in ms, starts are from the first kept frame, returns the path
+    @classmethod
+    def export(cls):
+        frames = sorted(((start, name, number, sections) for name, each in cls.loops.items()
+                         for number, (start, sections) in enumerate(each.frames)), key=lambda row: row[0])
+        columns = list(dict.fromkeys(section for *_, sections in frames for section in sections if section != "frame"))
+        first = frames[0][0] if frames else 0
+        path = os.path.join(EXPORT_FOLDER, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        with open(path, "wt", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["loop", "frame", "start", "length"] + columns)
+            for start, name, number, sections in frames:
+                writer.writerow([name, number, f"{(start - first) / 1e6:.3f}", f"{sections['frame'] / 1e6:.3f}"]
+                                + [f"{sections[section] / 1e6:.3f}" if section in sections else ""
+                                   for section in columns])
+        cls.exported = os.path.basename(path)
+        for each in cls.loops.values():
+            each.overlay = None
+        return path
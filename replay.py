@@ -0,0 +1,134 @@
+import base64
+import pygame
+
+# recordings of what the player did in a run, enough for simulation.py to play the run again tick by tick
+# Main.level fills one in while it's played, finished speedruns keep it encoded in their highscore as "replay"
+
+# inputs are the held arrow keys as bits, Player.movement walks the first direction it can in this order
+LEFT = 1
+RIGHT = 2
+UP = 4
+DOWN = 8
+KEYS = {LEFT: (pygame.K_a, pygame.K_LEFT), RIGHT: (pygame.K_d, pygame.K_RIGHT), UP: (pygame.K_w, pygame.K_UP),
+        DOWN: (pygame.K_s, pygame.K_DOWN)}
+MAGIC = b"MZR"
+VERSION = 3  # a run only plays the same under the rules it was recorded with, 3: guards that don't chase wander
+
+
+# the inputs of what pygame.key.get_pressed gave
+def read_inputs(keys_pressed):
+    inputs = 0
+    for bit, (letter, arrow) in KEYS.items():
+        if keys_pressed[letter] or keys_pressed[arrow]:
+            inputs |= bit
+    return inputs
+
+
+class Recording:
+    def __init__(self, animation_length: int):
+        self.animation_length = animation_length  # player speed at the start of the run
+        self.current_length = animation_length
+        self.levels = []
+        self.inputs = 0  # last recorded inputs of the current level
+
+    # every level of the run gets one, also the lost ones
+    def start_level(self):
+        self.levels.append({"ticks": 0, "inputs": [], "answers": [], "speeds": []})
+        self.inputs = 0
+
+    # inputs held from tick on, only needed when they change on a tick where the player can start a step
+    def press(self, tick: int, inputs: int):
+        self.levels[-1]["inputs"].append((tick, inputs))
+        self.inputs = inputs
+
+    # questions in the order they were answered, True for the right answer
+    def answer(self, correct: bool):
+        self.levels[-1]["answers"].append(correct)
+
+    # player speed changed in the pause menu, the new animation length is used from tick on
+    def speed(self, tick: int, animation_length: int):
+        self.levels[-1]["speeds"].append((tick, animation_length))
+        self.current_length = animation_length
+
+    def end_level(self, ticks: int):
+        self.levels[-1]["ticks"] = ticks
+
+    # MAGIC, VERSION, then varints: animation length, level count and for every level its ticks, the inputs as
+    # (ticks since the previous change << 4 | inputs), the answers as bits and the speed changes
+    # comes out as base64 text, so it fits in the highscores json and the database
+    def encode(self):
+        data = bytearray(MAGIC)
+        data.append(VERSION)
+        write_varint(data, self.animation_length)
+        write_varint(data, len(self.levels))
+        for level in self.levels:
+            write_varint(data, level["ticks"])
+            write_varint(data, len(level["inputs"]))
+            previous = 0
+            for tick, inputs in level["inputs"]:
+                write_varint(data, (tick - previous) << 4 | inputs)
+                previous = tick
+            write_varint(data, len(level["answers"]))
+            bits = bytearray((len(level["answers"]) + 7) // 8)
+            for i, correct in enumerate(level["answers"]):
+                if correct:
+                    bits[i // 8] |= 1 << i % 8
+            data += bits
+            write_varint(data, len(level["speeds"]))
+            for tick, animation_length in level["speeds"]:
+                write_varint(data, tick)
+                write_varint(data, animation_length)
+        return base64.b64encode(bytes(data)).decode("ascii")
+
+    # raises ValueError if the text isn't a recording
+    @classmethod
+    def decode(cls, text: str):
+        try:
+            data = base64.b64decode(text, validate=True)
+        except (TypeError, ValueError):
+            raise ValueError("replay is not base64") from None
+        if data[:len(MAGIC)] != MAGIC or data[len(MAGIC):len(MAGIC) + 1] != bytes((VERSION,)):
+            raise ValueError("unknown replay format")
+        position = len(MAGIC) + 1
+
+        def varint():
+            nonlocal position
+            value = shift = 0
+            while True:
+                if position >= len(data):
+                    raise ValueError("replay is cut short")
+                byte = data[position]
+                position += 1
+                value |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    return value
+
+        recording = cls(varint())
+        for _ in range(varint()):
+            recording.start_level()
+            level = recording.levels[-1]
+            level["ticks"] = varint()
+            tick = 0
+            for _ in range(varint()):
+                value = varint()
+                tick += value >> 4
+                level["inputs"].append((tick, value & 15))
+            count = varint()
+            bits = data[position:position + (count + 7) // 8]
+            if len(bits) < (count + 7) // 8:
+                raise ValueError("replay is cut short")
+            position += len(bits)
+            level["answers"] = [bool(bits[i // 8] >> i % 8 & 1) for i in range(count)]
+            level["speeds"] = [(varint(), varint()) for _ in range(varint())]
+        if position != len(data):
+            raise ValueError("replay has trailing data")
+        return recording
+
+
+# 7 bits at a time, lowest first, the high bit says another byte follows
+def write_varint(data: bytearray, value: int):
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
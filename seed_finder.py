@@ -1,11 +1,9 @@
 import sys
 import time
-import queue
 import os
-import copy
-import pygame
+import queue
 from datetime import datetime
-from main import Maze
+from maze_core import Maze, key_route
 import random
 import logging
 import multiprocessing
@@ -14,197 +12,193 @@ EASY = (11, 7)
 NORMAL = (31, 17)
 HARD = (51, 27)
 FULL_VIEW = (15, 9)
-
-
-# function that finds the shortest path between two given points in the maze
-def path_finder(maze_object: Maze, start_pos: tuple, end: str, wall_block: str = "w"):
-    maze = maze_object.maze
-    q = queue.Queue()
-    q.put((start_pos, [start_pos]))
-    visited = set()
-
-    while not q.empty():
-        current_pos, path = q.get()
-        col, row = current_pos
-
-        if maze_object.is_tile(row, col, end):
-            return path
-
-        neighbours = find_neighbours(maze, row, col)
-        for neighbour in neighbours:
-            # removing paths that backtrack or lead to walls
-            if neighbour in visited:
-                continue
-            r, c = neighbour
-            if maze[r][c] == wall_block:
-                continue
-
-            new_path = path + [neighbour]
-            q.put((neighbour, new_path))
-            visited.add(neighbour)
-    raise ValueError("path not found")
-
-
-# sub function for the path_finder func
-def find_neighbours(maze: list, row: int, col: int):
-    neighbours = []
-    if row > 0:
-        neighbours.append((col, row - 1))
-    if row < len(maze[0]) - 1:
-        neighbours.append((col, row + 1))
-    if col > 0:
-        neighbours.append((col - 1, row))
-    if col < len(maze) - 1:
-        neighbours.append((col + 1, row))
-
-    return neighbours
-
-target_time = 1800  # 10 minutes
-def main():
-    global best_best_easy
-
-    pygame.quit()
-    best_best_easy = {"total": 10000}
-    best_best_normal = {"total": 10000}
-    best_best_full_view = {"total": 10000}
-    best_best_hard = {"total": 10000}
-    best_easy = {"mode": "easy"}
-    best_normal = {"mode": "normal"}
-    best_hard = {"mode": "hard"}
-    best_full_view = {"mode": "full_view"}
-    end = time.time() + target_time
-    end = datetime.fromtimestamp(end).strftime("%H:%M:%S")
-    print(f"finishes at {end}")
-    elapsed_time = 0
-    while elapsed_time < target_time:
-        start_time = time.time()
-        seed = random.randint(-sys.maxsize, sys.maxsize)
-
-        rng = random.Random(seed)
-        width, height = EASY
-        maze = Maze(width, height, rng)
-        best_easy["seed"] = seed
-        for i in range(5):
-            start = maze.start[1], maze.start[0]
-            current = 0
-            best_easy[i + 1] = 0
-            required = len(maze.q_location) // 2
-            while current < required:
-                path = path_finder(maze, start, "Q")
-
-                y, x = path[-1]
-                maze.change_tile(x, y, "c")
-                start = (y, x)
-                current += 1
-                best_easy[i + 1] += len(path)
-            path = path_finder(maze, start, "F")
-            best_easy[i + 1] += len(path)
-
-            width += 4
-            height += 2
-            maze = Maze(width, height, rng)
-        best_easy["total"] = sum(best_easy[i + 1] for i in range(5))
-        if best_easy["total"] < best_best_easy["total"]:
-            best_best_easy = copy.deepcopy(best_easy)
-
-        """
-        rng = random.Random(seed)
-        width, height = NORMAL
-        maze = Maze(width, height, rng)
-        best_normal["seed"] = seed
-        for i in range(5):
-            start = maze.start[1], maze.start[0]
-            current = 0
-            best_normal[i + 1] = 0
-            required = len(maze.q_location) // 2
-            while current < required:
-                path = path_finder(maze, start, "Q")
-
-                y, x = path[-1]
-                maze.change_tile(x, y, "c")
-                start = (y, x)
-                current += 1
-                best_normal[i + 1] += len(path)
-            path = path_finder(maze, start, "F")
-            best_normal[i + 1] += len(path)
-
-            width += 4
-            height += 2
-            maze = Maze(width, height, rng)
-        best_normal["total"] = sum(best_normal[i + 1] for i in range(5))
-        if best_normal["total"] < best_best_normal["total"]:
-            best_best_normal = copy.deepcopy(best_normal)
-
-        rng = random.Random(seed)
-        width, height = HARD
-        maze = Maze(width, height, rng)
-        best_hard["seed"] = seed
-        for i in range(5):
-            start = maze.start[1], maze.start[0]
-            current = 0
-            best_hard[i + 1] = 0
-            required = len(maze.q_location) // 2
-            while current < required:
-                path = path_finder(maze, start, "Q")
-
-                y, x = path[-1]
-                maze.change_tile(x, y, "c")
-                start = (y, x)
-                current += 1
-                best_hard[i + 1] += len(path)
-            path = path_finder(maze, start, "F")
-            best_hard[i + 1] += len(path)
-
-            width += 4
-            height += 2
+# first maze size and how much it grows every level, same as Main.speedrun_sizes
+MODES = {
+    "easy": (EASY, (4, 2)),
+    "normal": (NORMAL, (4, 2)),
+    "hard": (HARD, (4, 2)),
+    "full_view": (FULL_VIEW, (12, 6)),
+}
+LEVELS = 5
+EXACT_ROUTES = False  # true minimum route instead of the greedy one, only for levels with up to 14 keys (easy, normal)
+
+# search settings, the search stops at whichever limit comes first
+SEARCH_MODES = ("easy", "normal", "hard", "full_view")
+target_time = 1800  # 30 minutes
+MAX_SEEDS = None  # stop after this many seeds
+TARGET_SCORES = {}  # mode -> total, stop once every listed mode has a seed this good
+TOP_N = 10  # best seeds kept per mode
+BATCH_SIZE = 100  # seeds per work item
+BATCH_RETRIES = 1  # times a batch is sent again after its worker died with it, once more and the search stops
+CHECKPOINT_INTERVAL = 60  # seconds between checkpoint writes
+SEEDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seeds.txt")
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seeds_checkpoint.txt")
+
+top_seeds = {}  # mode -> list of records sorted from the best, filled by search()
+
+
+# fewest tiles any route can walk in a level: start is in the first column, door in the last one and every walk
+# ends on its own tile
+def level_lower_bound(width: int, height: int):
+    return width - 3 + max(height * width // 100 + 1, 2) // 2 + 1
+
+
+# tiles walked in every level of the run for the given seed, {mode: (level 1, ..., level 5)}
+# a mode is dropped (None) as soon as it can't get under its total in to_beat anymore
+def evaluate_seed(seed: int, modes: tuple = SEARCH_MODES, to_beat: dict = None):
+    to_beat = to_beat or {}
+    # every mode starts from the same seeded state, seeding is done once and the state copied
+    state = random.Random(seed).getstate()
+    rng = random.Random()
+    results = {}
+    for mode in modes:
+        (width, height), (grow_width, grow_height) = MODES[mode]
+        sizes = [(width + grow_width * i, height + grow_height * i) for i in range(LEVELS)]
+        remaining = sum(level_lower_bound(*size) for size in sizes)
+        limit = to_beat.get(mode)
+        rng.setstate(state)
+        levels = []
+        for width, height in sizes:
+            if limit is not None and sum(levels) + remaining >= limit:
+                levels = None
+                break
             maze = Maze(width, height, rng)
-        best_hard["total"] = sum(best_hard[i + 1] for i in range(5))
-        if best_hard["total"] < best_best_hard["total"]:
-            best_best_hard = copy.deepcopy(best_hard)
-
-        rng = random.Random(seed)
-        width, height = FULL_VIEW
-        maze = Maze(width, height, rng)
-        best_full_view["seed"] = seed
-        for i in range(5):
-            start = maze.start[1], maze.start[0]
-            current = 0
-            best_full_view[i + 1] = 0
-            required = len(maze.q_location) // 2
-            while current < required:
-                path = path_finder(maze, start, "Q")
-
-                y, x = path[-1]
-                maze.change_tile(x, y, "c")
-                start = (y, x)
-                current += 1
-                best_full_view[i + 1] += len(path)
-            path = path_finder(maze, start, "F")
-            best_full_view[i + 1] += len(path)
-
-            width += 12
-            height += 6
-            maze = Maze(width, height, rng)
-        best_full_view["total"] = sum(best_full_view[i + 1] for i in range(5))
-        if best_full_view["total"] < best_best_full_view["total"]:
-            best_best_full_view = copy.deepcopy(best_full_view)
-        """
-
-        end_time = time.time()
-        elapsed_time += end_time - start_time
-
-    with open(os.path.join(os.path.dirname(os.path.abspath(os.path.abspath(__file__))), "seeds.txt"),
-              "at", encoding="utf-8") as file:
-        file.write(str(best_best_easy))
-        file.write("\n")
-        """
-        file.write(str(best_best_normal))
-        file.write("\n")
-        file.write(str(best_best_hard))
-        file.write("\n")
-        file.write(str(best_best_full_view))
-        file.write("\n")
-        """
+            # closest key each time (or the shortest route with EXACT_ROUTES) and then the door, tiles of every walk
+            route, legs = key_route(maze.maze, maze.get_path_oracle(), maze.start, maze.q_location, maze.end,
+                                    len(maze.q_location) // 2, EXACT_ROUTES)
+            levels.append(sum(legs) + len(legs))
+            remaining -= level_lower_bound(width, height)
+        results[mode] = tuple(levels) if levels is not None else None
+    return results
+
+
+# the format seeds.txt always had
+def make_record(mode: str, seed: int, levels: tuple):
+    record = {"mode": mode, "seed": seed}
+    if EXACT_ROUTES:
+        record["route"] = "exact"
+    for i, level in enumerate(levels):
+        record[i + 1] = level
+    record["total"] = sum(levels)
+    return record
+
+
+# worker process, takes (batch number, batch seed, batch size, {mode: total to beat}) from tasks until it gets None
+# sends back (batch number, seeds done, [(mode, seed, levels), ...]) with only the seeds that beat the given totals
+def worker(tasks: multiprocessing.Queue, results: multiprocessing.Queue):
+    while (task := tasks.get()) is not None:
+        batch, batch_seed, count, to_beat = task
+        rng = random.Random(batch_seed)
+        found = {mode: [] for mode in SEARCH_MODES}
+        for _ in range(count):
+            seed = rng.randint(-sys.maxsize, sys.maxsize)
+            for mode, levels in evaluate_seed(seed, SEARCH_MODES, to_beat).items():
+                if levels is not None and (to_beat.get(mode) is None or sum(levels) < to_beat[mode]):
+                    found[mode].append((sum(levels), seed, levels))
+        # nothing past the batch's own best TOP_N can get into the global list
+        results.put((batch, count, [(mode, seed, levels) for mode, each in found.items()
+                             for _, seed, levels in sorted(each)[:TOP_N]]))
+
+
+# merges a result into top_seeds, returns True if the best seed of the mode changed
+def add_result(mode: str, seed: int, levels: tuple):
+    best = top_seeds.setdefault(mode, [])
+    if any(record["seed"] == seed for record in best):
+        return False
+    best.append(make_record(mode, seed, levels))
+    best.sort(key=lambda record: record["total"])
+    del best[TOP_N:]
+    return best[0]["seed"] == seed
+
+
+def save_checkpoint():
+    with open(CHECKPOINT_FILE + ".tmp", "wt", encoding="utf-8") as file:
+        for mode in top_seeds:
+            for record in top_seeds[mode]:
+                file.write(str(record))
+                file.write("\n")
+    os.replace(CHECKPOINT_FILE + ".tmp", CHECKPOINT_FILE)
+
+
+# appends the best seed of every mode to seeds.txt
+def save_results():
+    with open(SEEDS_FILE, "at", encoding="utf-8") as file:
+        for mode in top_seeds:
+            if top_seeds[mode]:
+                file.write(str(top_seeds[mode][0]))
+                file.write("\n")
+
+
+def start_worker(tasks: multiprocessing.Queue, results: multiprocessing.Queue):
+    process = multiprocessing.Process(target=worker, args=(tasks, results), daemon=True)
+    process.start()
+    return process
+
+
+# runs the workers and hands them batches of seeds until a limit is reached
+# every worker has its own task queue, so the batches a dead worker took with it are known and go to its replacement
+def search(workers: int = max(multiprocessing.cpu_count() - 1, 1)):
+    tasks = [multiprocessing.Queue() for _ in range(workers)]
+    results = multiprocessing.Queue()
+    processes = [start_worker(each, results) for each in tasks]
+    assigned = [{} for _ in range(workers)]  # batch number -> task, sent to the worker and not back yet
+    lost = {}  # batch number -> workers that died with it
+
+    start_time = time.time()
+    print(f"finishes at {datetime.fromtimestamp(start_time + target_time).strftime('%H:%M:%S')} at the latest")
+    last_checkpoint = start_time
+    searched = batches = 0
+    stopping = False
+    while not stopping or any(assigned):
+        for slot, process in enumerate(processes):
+            if process.is_alive():
+                continue
+            print(f"worker {process.pid} died with exit code {process.exitcode}, starting another one")
+            tasks[slot] = multiprocessing.Queue()  # batches still in the old queue are sent again below
+            processes[slot] = start_worker(tasks[slot], results)
+            for batch, task in assigned[slot].items():
+                lost[batch] = lost.get(batch, 0) + 1
+                if lost[batch] > BATCH_RETRIES:
+                    raise RuntimeError(f"seed finder batch {task[1]} killed {lost[batch]} workers")
+                tasks[slot].put(task)
+        # keeping every worker busy with a batch in reserve
+        while not stopping and sum(map(len, assigned)) < workers * 2:
+            to_beat = {mode: best[-1]["total"] for mode, best in top_seeds.items() if len(best) == TOP_N}
+            slot = min(range(workers), key=lambda i: len(assigned[i]))
+            batches += 1
+            assigned[slot][batches] = (batches, random.randint(-sys.maxsize, sys.maxsize), BATCH_SIZE, to_beat)
+            tasks[slot].put(assigned[slot][batches])
+        try:
+            batch, count, found = results.get(timeout=1)
+        except queue.Empty:
+            count, found = 0, []
+        else:
+            # a batch that was sent again can come back twice
+            if not any(each.pop(batch, None) for each in assigned):
+                count, found = 0, []
+        searched += count
+        for mode, seed, levels in found:
+            if add_result(mode, seed, levels):
+                print(f"new best {top_seeds[mode][0]}")
+
+        elapsed = time.time() - start_time
+        if time.time() - last_checkpoint >= CHECKPOINT_INTERVAL:
+            last_checkpoint = time.time()
+            save_checkpoint()
+            print(f"{searched} seeds, {searched / elapsed:.0f} seeds/s")
+        if elapsed >= target_time or (MAX_SEEDS is not None and searched >= MAX_SEEDS) or (TARGET_SCORES and all(
+                top_seeds.get(mode) and top_seeds[mode][0]["total"] <= total for mode, total in TARGET_SCORES.items())):
+            stopping = True
+
+    for each in tasks:
+        each.put(None)
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    save_checkpoint()
+    save_results()
+    print(f"{searched} seeds in {time.time() - start_time:.0f} s")
 
 
 # logging to file
@@ -219,20 +213,11 @@ def logging_setup():
 # catches exceptions idk, stackoverflow
 def handle_exception(exc_type, exc_value, exc_traceback):
     logger.error("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
-    with open(os.path.join(os.path.dirname(os.path.abspath(os.path.abspath(__file__))), "seeds.txt"),
-              "at", encoding="utf-8") as file:
-        file.write(str(best_best_easy))
-        file.write("\n")
+    save_results()
 
 
 if __name__ == "__main__":
     sys.excepthook = handle_exception
     logging_setup()
-    # use multiprocessing to run multiple instances of the main function
-    processes = []
-    for i in range(multiprocessing.cpu_count() - 1):
-        processes.append(multiprocessing.Process(target=main))
-        processes[-1].start()
-    for process in processes:
-        process.join()
+    search()
     print("done")
@@ -0,0 +1,161 @@
+import re
+import sys
+import time
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+from level import Level, Player, TICK_LENGTH, MAX_TICKS_PER_FRAME
+from maze_core import Maze, find_path, KEY
+from replay import Recording, LEFT, RIGHT, UP, DOWN, KEYS
+
+# levels without a window: the rules of level.py (keys, questions, guards, winning and losing) driven by a policy
+# instead of the keyboard and the question screen, the same seed and inputs always give the same run
+# run as: python simulation.py [seed] [difficulty], plays a speedrun with greedy_route
+
+# inputs are bits of the held arrow keys, see replay.py
+STEPS = {LEFT: (-1, 0), RIGHT: (1, 0), UP: (0, -1), DOWN: (0, 1)}
+# what pygame.key.get_pressed would give for every input
+KEYS_PRESSED = tuple(defaultdict(bool, {arrow: True for bit, (_, arrow) in KEYS.items() if inputs & bit})
+                     for inputs in range(16))
+MAX_LEVEL_TIME = 900000  # ms of game time, a level still going after that is stopped so a stuck policy can't hang
+
+
+# plays one level, policy(player, tick) gives the held keys and answer(player) if the question gets answered right
+# the policy is only asked on ticks where the player can start a step, those are the only ticks the keys matter
+# speeds are [(tick, animation length), ...] of player speed changes during the level
+# returns {"state": "win", "lose" (caught), "Q" (not enough keys left) or "timeout", "ticks", "time" in seconds,
+#          "keys", "questions"}
+def run_level(maze: Maze, policy, answer=None, max_time: int = MAX_LEVEL_TIME, speeds: list = ()):
+    player = Level.start_level(Player(maze))
+    speeds = dict(speeds)
+    questions = 0
+    state = "timeout"
+    for tick in range(max_time // TICK_LENGTH):
+        if speeds and tick in speeds:
+            Level.animation_length = speeds[tick]
+        keys_pressed = KEYS_PRESSED[policy(player, tick) if Level.can_move["all"] else 0]
+        result = Level.level_tick(player, keys_pressed)
+        if result == "question":
+            questions += 1
+            Level.take_key(player, answer(player) if answer else True)
+        elif result:
+            state = result
+            break
+    return {"state": state, "ticks": tick + 1, "time": (tick + 1) * TICK_LENGTH / 1000, "keys": Level.keys,
+            "questions": questions}
+
+
+# plays the five levels of a speedrun from the seed the way Main.speedrun_mode does, stops at the first lost level
+# policy and answer are the same as for run_level, speed is the player speed setting
+# returns the result of every level played
+def run_speedrun(seed: int, difficulty: str, policy, answer=None, speed: str = "Normal"):
+    with headless(Level.speed_to_length[speed]):
+        rng = random.Random(seed)
+        results = []
+        for width, height in Level.speedrun_sizes(difficulty):
+            results.append(run_level(Maze(width, height, rng), policy, answer))
+            if results[-1]["state"] != "win":
+                break
+        return results
+
+
+# plays a recorded speedrun again, returns the result of every level played like run_speedrun
+def replay_speedrun(seed: int, difficulty: str, recording: Recording):
+    with headless(recording.animation_length):
+        rng = random.Random(seed)
+        results = []
+        for (width, height), level in zip(Level.speedrun_sizes(difficulty), recording.levels):
+            answers = iter(level["answers"])
+            maze = Maze(width, height, rng)
+            results.append(run_level(maze, scripted(level["inputs"]), lambda player: next(answers, False),
+                                     level["ticks"] * TICK_LENGTH, level["speeds"]))
+            if results[-1]["state"] != "win":
+                break
+        return results
+
+
+# checks a speedrun highscore by playing its replay again, it has to win all five levels on exactly the recorded ticks
+# and no claimed level time may be shorter than the game time the level took
+# (the time shown lags by up to a frame of ticks behind the game)
+def verify_speedrun(entry: dict, difficulty: str):
+    try:
+        recording = Recording.decode(entry["replay"])
+        claimed = [float(each) for each in re.findall(r"\d+(?:\.\d+)?", entry["level times"])]
+        total = float(entry["time"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    difficulty = next((name for name in Level.diff_to_number if name.lower() == difficulty.lower()), None)
+    if difficulty is None or len(recording.levels) != 5 or len(claimed) != 5:
+        return False
+
+    results = replay_speedrun(entry["seed"], difficulty, recording)
+    slack = MAX_TICKS_PER_FRAME * TICK_LENGTH / 1000
+    return len(results) == 5 and total >= sum(claimed) - 0.01 and all(
+        result["state"] == "win" and result["ticks"] == level["ticks"] and time >= result["time"] - slack
+        for result, level, time in zip(results, recording.levels, claimed))
+
+
+# the player speed of the run, the one of the game is put back afterwards
+@contextmanager
+def headless(animation_length: int):
+    previous = Level.animation_length
+    Level.animation_length = animation_length
+    try:
+        yield
+    finally:
+        Level.animation_length = previous
+
+
+# policy that plays back a script of [(tick, inputs), ...] sorted by tick, the inputs are held until the next entry
+def scripted(script: list):
+    position = 0
+    inputs = 0
+
+    def policy(player, tick: int):
+        nonlocal position, inputs
+        while position < len(script) and script[position][0] <= tick:
+            inputs = script[position][1]
+            position += 1
+        return inputs
+
+    return policy
+
+
+# policy of the seed finder: walks to the closest key until there are enough of them and then to the door
+# guards are ignored
+def greedy_route(player, tick: int):
+    maze = player.maze
+    if Level.keys < Level.required_keys:
+        path = find_path(maze.maze, (player.x, player.y), tile=KEY)
+    else:
+        path = find_path(maze.maze, (player.x, player.y), maze.end)
+    if len(path) < 2:
+        return 0
+    step = (path[1][0] - player.x, path[1][1] - player.y)
+    return next(bit for bit, each in STEPS.items() if each == step)
+
+
+# policy that holds random keys for a random number of ticks, a player the guards haven't seen before
+def random_walk(seed: int):
+    rng = random.Random(seed)
+    held = [0, 0]  # inputs, tick until which they are held
+
+    def policy(player, tick: int):
+        if tick >= held[1]:
+            held[:] = rng.randrange(16), tick + rng.randint(1, 200)
+        return held[0]
+
+    return policy
+
+
+if __name__ == "__main__":
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else random.randint(-sys.maxsize, sys.maxsize)
+    difficulty = sys.argv[2] if len(sys.argv) > 2 else "Normal"
+    start = time.perf_counter()
+    results = run_speedrun(seed, difficulty, greedy_route)
+    elapsed = time.perf_counter() - start
+    for level, result in enumerate(results, 1):
+        print(f"level {level}: {result}")
+    ticks = sum(result["ticks"] for result in results)
+    print(f"seed {seed}, {difficulty}: {ticks} ticks in {elapsed:.2f} s, "
+          f"{ticks * TICK_LENGTH / 1000 / elapsed:.0f}x real time")
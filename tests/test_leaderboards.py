@@ -0,0 +1,83 @@
+import uuid
+import pytest
+from pymongo.errors import BulkWriteError
+from benchmark import MemoryDatabase
+from leaderboards import Leaderboards, merge, WRITE_ATTEMPTS
+
+BOARD = "speedrun_easy"
+
+
+def entry(name: str, time: float):
+    return {"_id": 0, "place": 0, "name": name, "time": time, "seed": 0, "start": 0, "end": 0, "level times": "",
+            "token": 0}
+
+
+# entries on the board by place, without the etag
+def places(database: MemoryDatabase, board: str = BOARD):
+    return [document for _id, document in sorted(database[board].documents.items()) if _id]
+
+
+# another client writes its entries to the board right after each of the next times reads of it
+def interfere(database: MemoryDatabase, others: list, times: int):
+    collection = database[BOARD]
+    find = collection.find
+    pending = [times]
+
+    def find_then_write(query: dict):
+        documents = find(query)
+        if pending[0]:
+            pending[0] -= 1
+            remote = [document for document in documents if document["_id"]]
+            for document in merge(BOARD, [others[pending[0] % len(others)]], remote):
+                collection.documents[document["_id"]] = document
+            collection.documents[0] = {"_id": 0, "etag": uuid.uuid4().hex}
+        return documents
+
+    collection.find = find_then_write
+
+
+@pytest.fixture
+def database():
+    database = MemoryDatabase()
+    Leaderboards(database).sync({BOARD: [entry(f"bot{i}", 100 + i) for i in range(1, 10)]})
+    database.operations.clear()
+    return database
+
+
+def test_sync_is_one_find_and_one_bulk_write(database):
+    etag, entries = Leaderboards(database).sync({BOARD: [entry("player", 50)]})[BOARD]
+    assert database.operations == ["find", "bulk_write"]
+    assert entries == places(database)
+    assert [each["name"] for each in entries][:2] == ["player", "bot1"]
+    assert etag == database[BOARD].documents[0]["etag"]
+
+
+def test_sync_without_changes_only_reads(database):
+    before = dict(database[BOARD].documents)
+    Leaderboards(database).sync({BOARD: [entry("bot9", 109)]})
+    assert database.operations == ["find"]
+    assert database[BOARD].documents == before
+
+
+def test_every_board_is_one_find_and_one_bulk_write(database):
+    boards = {BOARD: [entry("player", 50)], "speedrun_hard": [entry("player", 900)]}
+    Leaderboards(database).sync(boards)
+    assert database.operations == ["find", "bulk_write"] * 2
+
+
+def test_conflict_reads_merges_and_writes_again(database):
+    interfere(database, [entry("other", 60)], 1)
+    etag, entries = Leaderboards(database).sync({BOARD: [entry("player", 50)]})[BOARD]
+    assert database.operations == ["find", "bulk_write"] * 2
+    assert [each["name"] for each in places(database)][:3] == ["player", "other", "bot1"]
+    assert entries == places(database)
+    assert etag == database[BOARD].documents[0]["etag"]
+    assert "writing" not in database[BOARD].documents[0]
+
+
+def test_conflicts_stop_after_write_attempts(database):
+    interfere(database, [entry(f"other{i}", 60 + i) for i in range(WRITE_ATTEMPTS)], WRITE_ATTEMPTS)
+    with pytest.raises(BulkWriteError):
+        Leaderboards(database).sync({BOARD: [entry("player", 50)]})
+    assert database.operations == ["find", "bulk_write"] * WRITE_ATTEMPTS
+    assert "player" not in [each["name"] for each in places(database)]
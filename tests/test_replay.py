@@ -0,0 +1,73 @@
+import random
+import pytest
+from level import Level
+from main import Database
+from maze_core import Maze
+from replay import Recording
+from simulation import run_level, headless, greedy_route, verify_speedrun
+
+SEED = 0  # greedy_route wins all five easy levels of it
+
+
+# a speedrun highscore the way Main.speedrun_mode saves it, played by greedy_route with every question right
+def speedrun_entry(seed: int, difficulty: str):
+    recording = Recording(Level.speed_to_length["Normal"])
+
+    def policy(player, tick: int):
+        inputs = greedy_route(player, tick)
+        if inputs != recording.inputs:
+            recording.press(tick, inputs)
+        return inputs
+
+    def answer(player):
+        recording.answer(True)
+        return True
+
+    times = []
+    with headless(recording.animation_length):
+        rng = random.Random(seed)
+        for width, height in Level.speedrun_sizes(difficulty):
+            recording.start_level()
+            result = run_level(Maze(width, height, rng), policy, answer)
+            recording.end_level(result["ticks"])
+            assert result["state"] == "win"
+            times.append(result["time"])
+    return {"_id": 1, "place": 1, "name": "player", "time": sum(times), "level times": str(times), "seed": seed,
+            "seed_type": "random", "start": 0, "end": 0, "token": 1, "replay": recording.encode()}
+
+
+@pytest.fixture(scope="module")
+def entry():
+    return speedrun_entry(SEED, "Easy")
+
+
+def test_recorded_run_verifies(entry):
+    assert verify_speedrun(entry, "easy")
+    assert Database.verified("speedrun_easy", [entry]) == [entry]
+
+
+def test_tampered_replay_is_rejected(entry):
+    recording = Recording.decode(entry["replay"])
+    tick, inputs = recording.levels[0]["inputs"][3]
+    recording.levels[0]["inputs"][3] = (tick, inputs ^ 15)
+    tampered = dict(entry, replay=recording.encode(), verified=True)
+    assert not verify_speedrun(tampered, "easy")
+    assert Database.verified("speedrun_easy", [tampered]) == []
+
+
+def test_faster_claimed_times_are_rejected(entry):
+    times = [float(each) - 1 for each in entry["level times"][1:-1].split(", ")]
+    faster = dict(entry, time=sum(times), **{"level times": str(times)})
+    assert Database.verified("speedrun_easy", [faster]) == []
+
+
+def test_runs_without_replay_stay_local(entry):
+    bot = {"_id": 2, "place": 2, "name": "bot1", "time": 90, "seed": 0, "start": 0, "end": 0, "level times": "",
+           "token": 0}
+    assert Database.verified("speedrun_easy", [entry, bot]) == [entry]
+    assert Database.verified("speedrun_easy", [dict(entry, replay="abc")]) == []
+
+
+def test_other_boards_are_not_checked():
+    entries = [{"_id": 1, "place": 1, "name": "bot9", "score": 9000, "seed": 0, "start": 0, "end": 0, "token": 0}]
+    assert Database.verified("endless_all", entries) == entries